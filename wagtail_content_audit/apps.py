@@ -1,7 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class WagtailAuditAppConfig(AppConfig):
     name = "wagtail_content_audit"
     label = "wagtail_content_audit"
     verbose_name = "Wagtail Audit"
+    default_auto_field = "django.db.models.AutoField"
+
+    def ready(self):
+        # The block usage index is only kept up to date for sites that use
+        # it
+        if getattr(settings, "WAGTAIL_CONTENT_AUDIT_INDEX", False):
+            from wagtail_content_audit.signal_handlers import (
+                register_signal_handlers,
+            )
+
+            register_signal_handlers()
@@ -0,0 +1,136 @@
+import json
+from functools import cache
+from hashlib import blake2b
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.contrib.typed_table_block.blocks import TypedTableBlock
+
+from wagtail_content_audit.utils import dotted_name
+
+
+def get_traversal_cache():
+    """Return the Django cache named by the WAGTAIL_CONTENT_AUDIT_CACHE
+    setting, or None if traversal results shouldn't be cached"""
+    alias = getattr(settings, "WAGTAIL_CONTENT_AUDIT_CACHE", None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_block_signature(block, parent=""):
+    """Yield the path and class of a block's children, recursively"""
+    if isinstance(block, ListBlock):
+        child_blocks = {"item": block.child_block}
+    elif isinstance(block, (StreamBlock, StructBlock, TypedTableBlock)):
+        child_blocks = block.child_blocks
+    else:
+        child_blocks = {}
+
+    for child_name, child_block in child_blocks.items():
+        path = parent + "." + child_name if parent != "" else child_name
+        yield path, dotted_name(child_block.__class__)
+        yield from get_block_signature(child_block, parent=path)
+
+
+@cache
+def get_streamfield_fingerprint(page_model, field_name):
+    """Return a hash of a StreamField's block definitions, so that cached
+    traversals are invalidated when the blocks change"""
+    streamfield = page_model._meta.get_field(field_name)
+    signature = repr(list(get_block_signature(streamfield.stream_block)))
+    return blake2b(signature.encode(), digest_size=16).hexdigest()
+
+
+def get_content_hash(stream_value):
+    raw_json = json.dumps(
+        list(stream_value.raw_data), sort_keys=True, cls=DjangoJSONEncoder
+    )
+    return blake2b(raw_json.encode(), digest_size=16).hexdigest()
+
+
+def get_traversal_key(name, streamfield, page_id, stream_value):
+    """Return the cache key of a traversal of a page's StreamField value"""
+    return ":".join(
+        (
+            "wagtail_content_audit",
+            name,
+            str(page_id),
+            streamfield.name,
+            get_content_hash(stream_value),
+            get_streamfield_fingerprint(streamfield.model, streamfield.name),
+        )
+    )
+
+
+def memoize_traversal(name, streamfield, page_id, stream_value, traverse):
+    """Return the results of traversing a page's StreamField value
+
+    When a traversal cache is configured, results are stored as a list keyed
+    by the page, field, a hash of the field's raw JSON, and a fingerprint of
+    its block definitions, and only pages whose content has changed since
+    they were last traversed are walked again. Results are kept until the
+    cache evicts them. Otherwise, this returns the traverse() generator."""
+    traversal_cache = get_traversal_cache()
+    if traversal_cache is None:
+        return traverse()
+
+    cache_key = get_traversal_key(name, streamfield, page_id, stream_value)
+    results = traversal_cache.get(cache_key)
+    if results is None:
+        results = list(traverse())
+        traversal_cache.set(cache_key, results, timeout=None)
+    return results
+
+
+class TraversalBatch:
+    """Memoize the traversals of a batch of pages' StreamField values, like
+    memoize_traversal(), with one cache lookup for the whole batch and one
+    write of the traversals that weren't cached"""
+
+    def __init__(self, name):
+        self.name = name
+        self.traversal_cache = get_traversal_cache()
+        self.keys = {}
+        self.cached = {}
+        self.new = {}
+
+    def load(self, values):
+        """Look up the cached traversals of (StreamField, page ID, stream
+        value) tuples, saving any new traversals of the previous batch"""
+        if self.traversal_cache is None:
+            return
+        self.save()
+        self.keys = {
+            (streamfield.name, page_id): get_traversal_key(
+                self.name, streamfield, page_id, stream_value
+            )
+            for streamfield, page_id, stream_value in values
+        }
+        self.cached = self.traversal_cache.get_many(self.keys.values())
+
+    def memoize(self, streamfield, page_id, stream_value, traverse):
+        """Return the results of traversing a page's StreamField value, from
+        the loaded batch if they were cached"""
+        if self.traversal_cache is None:
+            return traverse()
+
+        cache_key = self.keys.get((streamfield.name, page_id))
+        if cache_key is None:
+            cache_key = get_traversal_key(
+                self.name, streamfield, page_id, stream_value
+            )
+        results = self.cached.get(cache_key)
+        if results is None:
+            results = list(traverse())
+            self.new[cache_key] = results
+        return results
+
+    def save(self):
+        """Store the traversals that weren't cached"""
+        if len(self.new) > 0:
+            self.traversal_cache.set_many(self.new, timeout=None)
+            self.new = {}
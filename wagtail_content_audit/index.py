@@ -0,0 +1,84 @@
+import itertools
+from collections import Counter
+
+from django.db import transaction
+
+from wagtail_content_audit.models import IndexedBlockUsage
+from wagtail_content_audit.query.blockusage import traverse_raw_streamvalue
+
+
+def get_page_block_usage(page_model, page_id, streamfield_values):
+    """Yield unsaved IndexedBlockUsage objects for a page's StreamField
+    values, given as a dictionary of field name to StreamValue"""
+    for streamfield_name, streamfield_value in streamfield_values.items():
+        streamfield = page_model._meta.get_field(streamfield_name)
+        occurrences = Counter(
+            traverse_raw_streamvalue(
+                streamfield.stream_block, streamfield_value.raw_data
+            )
+        )
+        for block_path, count in occurrences.items():
+            yield IndexedBlockUsage(
+                page_id=page_id,
+                field=streamfield_name,
+                path=block_path,
+                occurrences=count,
+            )
+
+
+def index_pages(page_model, page_rows):
+    """Replace the indexed block usage of pages of a page model
+
+    page_rows is an iterable of (page ID, *StreamField values) tuples, in the
+    order of page_model.get_streamfield_names()."""
+    streamfield_names = page_model.get_streamfield_names()
+    page_ids = []
+    block_usage = []
+    for page_id, *streamfield_values in page_rows:
+        page_ids.append(page_id)
+        block_usage.extend(
+            get_page_block_usage(
+                page_model,
+                page_id,
+                dict(zip(streamfield_names, streamfield_values, strict=True)),
+            )
+        )
+
+    with transaction.atomic():
+        IndexedBlockUsage.objects.filter(page_id__in=page_ids).delete()
+        IndexedBlockUsage.objects.bulk_create(block_usage)
+
+
+def index_page(page):
+    """Replace the indexed block usage of a single page"""
+    page = page.specific
+    page_model = type(page)
+    index_pages(
+        page_model,
+        [
+            (
+                page.pk,
+                *(
+                    getattr(page, streamfield_name)
+                    for streamfield_name in page_model.get_streamfield_names()
+                ),
+            )
+        ],
+    )
+
+
+def index_page_model(page_model, batch_size=500):
+    """Index the block usage of all pages of a page model in batches, and
+    return the number of pages indexed"""
+    page_rows = (
+        page_model.objects.exact_type(page_model)
+        .values_list("pk", *page_model.get_streamfield_names())
+        .iterator(chunk_size=batch_size)
+    )
+
+    pages_count = 0
+    while batch := list(itertools.islice(page_rows, batch_size)):
+        index_pages(page_model, batch)
+        pages_count += len(batch)
+
+    return pages_count
@@ -1,8 +1,16 @@
-import csv
+from django.core.management.base import BaseCommand, CommandError
 
-from django.core.management.base import BaseCommand
+from wagtail.models import Site
 
+from wagtail_content_audit.management.output import (
+    Column,
+    add_output_arguments,
+    add_stats_argument,
+    open_row_writer,
+    write_stats,
+)
 from wagtail_content_audit.query import BlockUsageQuerySet
+from wagtail_content_audit.query.blockusage import ENGINES, PERIODS
 from wagtail_content_audit.utils import get_page_models_and_fields
 
 
@@ -27,11 +35,105 @@ class Command(BaseCommand):
                 "For example, v1.BrowsePage.content."
             ),
         )
+        parser.add_argument(
+            "-e",
+            "--engine",
+            choices=ENGINES,
+            default="streamvalue",
+            help=(
+                "How to read StreamField content. "
+                "The raw engine walks the stored JSON instead of building "
+                "StreamValue objects, which is considerably faster. "
+                "The database engine aggregates block usage in PostgreSQL, "
+                "and otherwise behaves like the raw engine. "
+                "The index engine aggregates the block usage index kept by "
+                "the build_block_usage_index command and page publishing."
+            ),
+        )
+
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            default=1,
+            help=(
+                "The number of worker processes to audit pages with. "
+                "Each page type is split between the workers by page ID."
+            ),
+        )
+
+        parser.add_argument(
+            "--sites",
+            action="store_true",
+            help=(
+                "Add a column for each site with the number of its pages "
+                "each block is used on."
+            ),
+        )
+
+        parser.add_argument(
+            "--revisions",
+            action="store_true",
+            help=(
+                "Audit the block usage of every revision of every page, "
+                "rather than of the pages' current content. "
+                "A row is output for each block and period with the number "
+                "of revisions created in that period the block is used in."
+            ),
+        )
+        parser.add_argument(
+            "--period",
+            choices=PERIODS,
+            default="month",
+            help="The period to count revisions by with --revisions.",
+        )
+
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Save the audit's progress under the given name after each "
+                "batch of pages, so that it can be resumed with --resume. "
+                "Only the streamvalue and raw engines can be checkpointed."
+            ),
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help=(
+                "Resume the audit saved with --checkpoint, rather than "
+                "starting it again."
+            ),
+        )
+
+        add_output_arguments(parser)
+        add_stats_argument(parser)
 
     def handle(self, *args, **options):
         pagetypes = options["pagetype"]
 
-        audited_blocks_qs = BlockUsageQuerySet()
+        if options["resume"] and options["checkpoint"] is None:
+            raise CommandError("--resume requires --checkpoint.")
+        if options["checkpoint"] is not None and (
+            options["engine"] not in ("streamvalue", "raw")
+            or options["jobs"] > 1
+            or options["revisions"]
+        ):
+            raise CommandError(
+                "--checkpoint can only be used with the streamvalue or raw "
+                "engine, in a single process, and without --revisions."
+            )
+
+        audited_blocks_qs = BlockUsageQuerySet().filter(
+            engine=options["engine"],
+            workers=options["jobs"],
+            revisions=options["revisions"],
+            period=options["period"],
+            stats=options["stats"],
+        )
+        if options["checkpoint"] is not None:
+            audited_blocks_qs = audited_blocks_qs.filter(
+                checkpoint=options["checkpoint"], resume=options["resume"]
+            )
 
         if pagetypes is not None:
             for page_model, field_name in get_page_models_and_fields(
@@ -41,29 +143,87 @@ class Command(BaseCommand):
                     page_model=page_model, field=field_name
                 )
 
-        writer = csv.writer(self.stdout)
-        writer.writerow(
-            [
-                "Page Type",
-                "Field",
-                "Path",
-                "Block",
-                "Occurrences",
-                "Pages",
-                "Live",
-                "In Default Site",
-            ]
-        )
-        for audited_block in audited_blocks_qs.all():
-            writer.writerow(
-                [
+        if options["revisions"]:
+            self.write_revisions(options, audited_blocks_qs)
+        else:
+            self.write_blocks(options, audited_blocks_qs)
+
+        write_stats(audited_blocks_qs, self.stderr)
+
+    def write_blocks(self, options, audited_blocks_qs):
+        sites = list(Site.objects.order_by("pk")) if options["sites"] else []
+
+        columns = [
+            Column("Page Type", "page_type"),
+            Column("Field", "field"),
+            Column("Path", "path"),
+            Column("Block", "block"),
+            Column("Occurrences", "occurrences", int),
+            Column("Pages", "pages", int),
+            Column("Live", "live", int),
+            Column("In Default Site", "in_default_site", int),
+            *(
+                Column(f"In {site}", f"in_site_{site.pk}", int)
+                for site in sites
+            ),
+        ]
+        with open_row_writer(options, self.stdout, columns) as writer:
+            # Iterating the queryset would keep every result in memory
+            for audited_block in audited_blocks_qs.run_query():
+                writer.writerow(
+                    [
+                        audited_block.page_model,
+                        audited_block.field,
+                        audited_block.path,
+                        audited_block.block,
+                        audited_block.total_occurrences,
+                        audited_block.pages_count,
+                        audited_block.pages_live_count,
+                        audited_block.pages_in_default_site_count,
+                        *(
+                            audited_block.pages_per_site_count.get(site.pk, 0)
+                            for site in sites
+                        ),
+                    ]
+                )
+
+    def write_revisions(self, options, audited_blocks_qs):
+        columns = [
+            Column("Page Type", "page_type"),
+            Column("Field", "field"),
+            Column("Path", "path"),
+            Column("Block", "block"),
+            Column("Period", "period"),
+            Column("Revisions", "revisions", int),
+            Column("Last Used", "last_used"),
+        ]
+        with open_row_writer(options, self.stdout, columns) as writer:
+            # Iterating the queryset would keep every result in memory
+            for audited_block in audited_blocks_qs.run_query():
+                block_columns = [
                     audited_block.page_model,
                     audited_block.field,
                     audited_block.path,
                     audited_block.block,
-                    audited_block.total_occurrences,
-                    audited_block.pages_count,
-                    audited_block.pages_live_count,
-                    audited_block.pages_in_default_site_count,
                 ]
-            )
+                last_used_at = (
+                    audited_block.last_used_at.isoformat()
+                    if audited_block.last_used_at is not None
+                    else None
+                )
+
+                # Blocks no revision uses still get a row
+                if len(audited_block.revisions_by_period) == 0:
+                    writer.writerow([*block_columns, None, 0, last_used_at])
+
+                for period, revisions_count in sorted(
+                    audited_block.revisions_by_period.items()
+                ):
+                    writer.writerow(
+                        [
+                            *block_columns,
+                            period.isoformat(),
+                            revisions_count,
+                            last_used_at,
+                        ]
+                    )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from wagtail.models import get_page_models
+
+from wagtail_content_audit.index import index_page_model
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the block usage index for all pages. "
+        "The index is kept up-to-date as pages are published and "
+        "unpublished, and can be queried with block_usage --engine index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-p",
+            "--pagetype",
+            action="append",
+            help=(
+                "Specify the page type(s) to index."
+                "This should be given in the form app_name.page_type. "
+                "For example, v1.BrowsePage."
+            ),
+        )
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of pages to index in each transaction.",
+        )
+
+    def handle(self, *args, **options):
+        pagetypes = options["pagetype"]
+
+        for page_model in get_page_models():
+            pagetype_str = (
+                f"{page_model._meta.app_label}.{page_model._meta.object_name}"
+            )
+            if pagetypes is not None and pagetype_str not in pagetypes:
+                continue
+
+            if len(page_model.get_streamfield_names()) == 0:
+                continue
+
+            pages_count = index_page_model(
+                page_model, batch_size=options["batch_size"]
+            )
+            self.stdout.write(f"Indexed {pages_count} {pagetype_str} pages")
@@ -1,11 +1,30 @@
-import csv
+from argparse import ArgumentTypeError
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from wagtail_content_audit.management.output import (
+    Column,
+    add_output_arguments,
+    add_stats_argument,
+    open_row_writer,
+    write_stats,
+)
 from wagtail_content_audit.query import PageSearchQuerySet
+from wagtail_content_audit.query.pagesearch import TEXT_MODES
 from wagtail_content_audit.utils import get_page_models_and_fields
 
 
+def since_datetime(value):
+    since = parse_datetime(value)
+    if since is None:
+        raise ArgumentTypeError(f"Invalid date and time: {value}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
 class Command(BaseCommand):
     help = (
         "Search for a string or regular expression through page fields."
@@ -30,17 +49,83 @@ class Command(BaseCommand):
         parser.add_argument(
             "-s",
             "--search",
+            action="append",
             required=True,
             help=(
-                "The search string to match. This can be a regular expression."
+                "The search string to match. This can be a regular "
+                "expression. Give this more than once to search for several "
+                "patterns in one pass."
             ),
         )
 
+        parser.add_argument(
+            "--all-sites",
+            action="store_true",
+            help=(
+                "Search the live pages of every site, rather than only the "
+                "default site."
+            ),
+        )
+
+        parser.add_argument(
+            "--drafts",
+            action="store_true",
+            help=(
+                "Search the latest revision of every page, including "
+                "unpublished changes and pages that aren't live."
+            ),
+        )
+
+        parser.add_argument(
+            "--text-mode",
+            choices=TEXT_MODES,
+            default="rendered",
+            help=(
+                "How to search rich text in StreamFields: as the HTML it "
+                "renders to, as its stored source HTML, or as plain text."
+            ),
+        )
+
+        parser.add_argument(
+            "--since",
+            type=since_datetime,
+            help=(
+                "Only search pages published (or, with --drafts, with a "
+                "revision created) after the given ISO 8601 date and time."
+            ),
+        )
+
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Keep the results of the search under the given name, and "
+                "only search pages changed since the search was last run "
+                "with it, merging their results into the kept results."
+            ),
+        )
+
+        add_output_arguments(parser)
+        add_stats_argument(parser)
+
     def handle(self, *args, **options):
-        search_string = options["search"]
+        search_patterns = options["search"]
         pagetypes = options["pagetype"]
 
-        search_qs = PageSearchQuerySet().filter(search=search_string)
+        if options["since"] is not None and options["checkpoint"] is not None:
+            raise CommandError("--since can't be used with --checkpoint.")
+
+        search_qs = PageSearchQuerySet().filter(
+            search=search_patterns,
+            all_sites=options["all_sites"],
+            drafts=options["drafts"],
+            text_mode=options["text_mode"],
+            urls=True,
+            stats=options["stats"],
+        )
+        if options["since"] is not None:
+            search_qs = search_qs.filter(since=options["since"])
+        if options["checkpoint"] is not None:
+            search_qs = search_qs.filter(checkpoint=options["checkpoint"])
         if pagetypes is not None:
             for page_model, field_name in get_page_models_and_fields(
                 pagetypes
@@ -49,33 +134,39 @@ class Command(BaseCommand):
                     page_model=page_model, field=field_name
                 )
 
-        writer = csv.writer(self.stdout)
-        writer.writerow(
-            (
-                "Page ID",
-                "Page Type",
-                "Page Title",
-                "Page URL",
-                "Field",
-                "Field Type",
-                "Stream Field Path",
-                "Block Type",
-                "Result Path",
-                "Stream Field Matches",
-            )
-        )
-        for result in search_qs.all():
-            writer.writerow(
-                (
-                    result.page.id,
-                    result.page_model.__name__,
-                    result.page.title,
-                    result.page.url,
-                    result.field_name,
-                    result.field_type,
-                    ".".join(result.stream_field_path),
-                    result.block_type,
-                    ".".join(result.result_path),
-                    *result.matches,
+        columns = [
+            Column("Page ID", "page_id", int),
+            Column("Page Type", "page_type"),
+            Column("Page Title", "page_title"),
+            Column("Page URL", "page_url"),
+            Column("Site", "site"),
+            Column("Field", "field"),
+            Column("Field Type", "field_type"),
+            Column("Stream Field Path", "stream_field_path"),
+            Column("Block Type", "block_type"),
+            Column("Result Path", "result_path"),
+            Column("Search Patterns", "search_patterns", list),
+            Column("Stream Field Matches", "matches", list),
+        ]
+        with open_row_writer(options, self.stdout, columns) as writer:
+            # Iterating the queryset would keep every result in memory
+            for result in search_qs.run_query():
+                writer.writerow(
+                    (
+                        result.page_id,
+                        result.page_model.__name__,
+                        result.page_title,
+                        result.url,
+                        str(result.site) if result.site is not None else None,
+                        result.field_name,
+                        result.field_type,
+                        ".".join(result.stream_field_path),
+                        result.block_type,
+                        ".".join(result.result_path),
+                        result.patterns,
+                        # Patterns with groups match tuples of strings
+                        [str(match) for match in result.matches],
+                    )
                 )
-            )
+
+        write_stats(search_qs, self.stderr)
@@ -0,0 +1,215 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from django.core.management.base import CommandError
+
+
+try:
+    import pyarrow
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+OUTPUT_FORMATS = ("csv", "jsonl", "arrow")
+
+
+class Column(NamedTuple):
+    """A column of audit output, with its CSV header, the key of its values
+    in JSON Lines and Arrow output, and the type of its values, one of str,
+    int, or list (of strings)"""
+
+    header: str
+    key: str
+    type: type = str
+
+
+class RowWriter(ABC):
+    """Write rows of audit output in batches
+
+    Each row is a sequence of values in the order of the columns. Rows are
+    buffered and written, and the stream flushed, once batch_size rows have
+    been collected, and when the writer is closed."""
+
+    def __init__(self, stream, columns, batch_size=1000):
+        self.stream = stream
+        self.columns = columns
+        self.batch_size = batch_size
+        self.batch = []
+
+    def writerow(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.batch) > 0:
+            self.write_batch(self.batch)
+            self.batch = []
+        self.stream.flush()
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def write_batch(self, rows):
+        """Write a batch of rows to the stream"""
+
+
+class CSVRowWriter(RowWriter):
+    """Write rows as CSV, with a header row
+
+    A list in the last column is written as a variable number of columns,
+    and a list in any other column is joined with commas."""
+
+    def __init__(self, stream, columns, batch_size=1000):
+        super().__init__(stream, columns, batch_size=batch_size)
+        self.writer = csv.writer(stream)
+        self.writer.writerow(column.header for column in columns)
+
+    def format_row(self, row):
+        *values, last_value = row
+        *columns, last_column = self.columns
+        for index, (column, value) in enumerate(
+            zip(columns, values, strict=True)
+        ):
+            if column.type is list and value is not None:
+                values[index] = ", ".join(value)
+        if last_column.type is list:
+            return [*values, *(last_value or [])]
+        return [*values, last_value]
+
+    def write_batch(self, rows):
+        self.writer.writerows(self.format_row(row) for row in rows)
+
+
+class JSONLinesRowWriter(RowWriter):
+    """Write each row as a JSON object on its own line, keyed by column"""
+
+    def write_batch(self, rows):
+        keys = [column.key for column in self.columns]
+        self.stream.write(
+            "".join(
+                json.dumps(dict(zip(keys, row, strict=True))) + "\n"
+                for row in rows
+            )
+        )
+
+
+class ArrowRowWriter(RowWriter):
+    """Write rows as an Arrow IPC stream, with a record batch per batch of
+    rows, to a binary stream"""
+
+    def __init__(self, stream, columns, batch_size=1000):
+        super().__init__(stream, columns, batch_size=batch_size)
+        arrow_types = {
+            str: pyarrow.string(),
+            int: pyarrow.int64(),
+            list: pyarrow.list_(pyarrow.string()),
+        }
+        self.schema = pyarrow.schema(
+            [(column.key, arrow_types[column.type]) for column in columns]
+        )
+        self.writer = pyarrow.ipc.new_stream(stream, self.schema)
+
+    def write_batch(self, rows):
+        self.writer.write_batch(
+            pyarrow.record_batch(
+                [list(values) for values in zip(*rows, strict=True)],
+                schema=self.schema,
+            )
+        )
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+ROW_WRITERS = {
+    "csv": CSVRowWriter,
+    "jsonl": JSONLinesRowWriter,
+    "arrow": ArrowRowWriter,
+}
+
+
+def add_output_arguments(parser):
+    """Add the output format and file arguments of the audit commands"""
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help=(
+            "The output format. jsonl writes a JSON object per line, and "
+            "arrow writes an Arrow IPC stream, which requires pyarrow and "
+            "--output."
+        ),
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The file to write to, rather than standard output.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="The number of rows to write at a time.",
+    )
+
+
+def add_stats_argument(parser):
+    """Add the --stats argument of the audit commands"""
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help=(
+            "Write a breakdown of where the audit spent its time to "
+            "standard error once it finishes."
+        ),
+    )
+
+
+def write_stats(queryset, stderr):
+    """Write the stats of an audit queryset run with stats=True"""
+    if queryset.stats is not None:
+        for line in queryset.stats.summary():
+            stderr.write(line)
+
+
+@contextmanager
+def open_row_writer(options, stdout, columns):
+    """Open a RowWriter for the output arguments of an audit command,
+    writing to the --output file or to stdout, and close it when done"""
+    output_format = options["format"]
+    output = options["output"]
+
+    if output_format == "arrow":
+        if pyarrow is None:
+            raise CommandError("Arrow output requires pyarrow.")
+        if output is None:
+            raise CommandError("Arrow output requires --output.")
+
+    if output is None:
+        stream = stdout
+    elif output_format == "arrow":
+        stream = open(output, "wb", buffering=1024 * 1024)  # noqa: SIM115
+    else:
+        stream = open(  # noqa: SIM115
+            output,
+            "w",
+            buffering=1024 * 1024,
+            encoding="utf-8",
+            newline="",
+        )
+
+    try:
+        writer = ROW_WRITERS[output_format](
+            stream, columns, batch_size=options["batch_size"]
+        )
+        yield writer
+        writer.close()
+    finally:
+        if stream is not stdout:
+            stream.close()
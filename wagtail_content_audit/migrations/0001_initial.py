@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('wagtailcore', '0089_log_entry_data_json_null_to_object'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedBlockUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=255)),
+                ('path', models.CharField(max_length=255)),
+                ('occurrences', models.PositiveIntegerField()),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.page')),
+            ],
+            options={
+                'verbose_name_plural': 'indexed block usage',
+                'constraints': [models.UniqueConstraint(fields=('page', 'field', 'path'), name='unique_indexed_block_usage')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_content_audit', '0001_initial'),
+        ('wagtailcore', '0089_log_entry_data_json_null_to_object'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageSearchCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('search', models.JSONField(default=dict)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PageSearchCheckpointResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=255)),
+                ('field_type', models.CharField(max_length=255)),
+                ('stream_field_path', models.JSONField(default=list)),
+                ('block_type', models.CharField(blank=True, max_length=255, null=True)),
+                ('result_path', models.JSONField(default=list)),
+                ('matches', models.JSONField(default=list)),
+                ('patterns', models.JSONField(default=list)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='wagtail_content_audit.pagesearchcheckpoint')),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.page')),
+                ('site', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wagtailcore.site')),
+            ],
+        ),
+    ]
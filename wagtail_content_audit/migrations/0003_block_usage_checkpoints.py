@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_content_audit', '0002_page_search_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockUsageCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('audit', models.JSONField(default=dict)),
+                ('completed_page_models', models.JSONField(default=list)),
+                ('page_model', models.CharField(blank=True, max_length=255)),
+                ('last_page_id', models.BigIntegerField(blank=True, null=True)),
+                ('blocks', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtail_content_audit', '0003_block_usage_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockUsageCheckpointBatch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_model', models.CharField(max_length=255)),
+                ('last_page_id', models.BigIntegerField()),
+                ('page_ids', models.JSONField(default=dict)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='wagtail_content_audit.blockusagecheckpoint')),
+            ],
+        ),
+    ]
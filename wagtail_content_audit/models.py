@@ -0,0 +1,98 @@
+from django.db import models
+
+
+class IndexedBlockUsage(models.Model):
+    """The number of times a block path occurs in a page's StreamField"""
+
+    page = models.ForeignKey(
+        "wagtailcore.Page", on_delete=models.CASCADE, related_name="+"
+    )
+    field = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    occurrences = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["page", "field", "path"],
+                name="unique_indexed_block_usage",
+            )
+        ]
+        verbose_name_plural = "indexed block usage"
+
+    def __str__(self):
+        return f"{self.page_id} {self.field} {self.path}"
+
+
+class PageSearchCheckpoint(models.Model):
+    """A page search whose results are kept, and updated with only the pages
+    that have changed since its watermark"""
+
+    name = models.CharField(max_length=255, unique=True)
+    search = models.JSONField(default=dict)
+    watermark = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PageSearchCheckpointResult(models.Model):
+    """A match kept for a page search checkpoint"""
+
+    checkpoint = models.ForeignKey(
+        PageSearchCheckpoint, on_delete=models.CASCADE, related_name="results"
+    )
+    page = models.ForeignKey(
+        "wagtailcore.Page", on_delete=models.CASCADE, related_name="+"
+    )
+    site = models.ForeignKey(
+        "wagtailcore.Site",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    field_name = models.CharField(max_length=255)
+    field_type = models.CharField(max_length=255)
+    stream_field_path = models.JSONField(default=list)
+    block_type = models.CharField(max_length=255, null=True, blank=True)
+    result_path = models.JSONField(default=list)
+    matches = models.JSONField(default=list)
+    patterns = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"{self.checkpoint_id} {self.page_id} {self.field_name}"
+
+
+class BlockUsageCheckpoint(models.Model):
+    """The progress of a block usage audit, so that it can be resumed
+
+    blocks holds the partial counts of each page model audited so far, and
+    the audit of page_model has counted pages up to last_page_id. The pages
+    each block was found on are saved by the audit's batches."""
+
+    name = models.CharField(max_length=255, unique=True)
+    audit = models.JSONField(default=dict)
+    completed_page_models = models.JSONField(default=list)
+    page_model = models.CharField(max_length=255, blank=True)
+    last_page_id = models.BigIntegerField(null=True, blank=True)
+    blocks = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class BlockUsageCheckpointBatch(models.Model):
+    """The pages a batch of a checkpointed block usage audit found each
+    block on, so that each page ID is only saved once"""
+
+    checkpoint = models.ForeignKey(
+        BlockUsageCheckpoint, on_delete=models.CASCADE, related_name="batches"
+    )
+    page_model = models.CharField(max_length=255)
+    last_page_id = models.BigIntegerField()
+    page_ids = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"{self.checkpoint_id} {self.page_model} {self.last_page_id}"
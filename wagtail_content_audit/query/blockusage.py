@@ -1,4 +1,31 @@
-from dataclasses import dataclass
+import base64
+import itertools
+import json
+import math
+import multiprocessing
+import sys
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from functools import cache
+from time import perf_counter
+
+import django
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    DateField,
+    ExpressionWrapper,
+    Max,
+    Min,
+    Q,
+    Sum,
+)
+from django.db.models.functions import Trunc
 
 from wagtail.blocks import (
     BoundBlock,
@@ -13,11 +40,36 @@ from wagtail.contrib.typed_table_block.blocks import (
     TypedTable,
     TypedTableBlock,
 )
-from wagtail.models import Site, get_page_models
+from wagtail.models import Page, Revision, Site, get_page_models
 
 from queryish import Queryish
 
-from wagtail_content_audit.utils import dotted_name
+from wagtail_content_audit.cache import TraversalBatch, memoize_traversal
+from wagtail_content_audit.models import (
+    BlockUsageCheckpoint,
+    IndexedBlockUsage,
+)
+from wagtail_content_audit.query.postgresql import audit_blocks_in_database
+from wagtail_content_audit.stats import AuditStats
+from wagtail_content_audit.utils import (
+    SiteRootPaths,
+    dotted_name,
+    get_filter_value,
+    get_site_id_expression,
+    walk_raw_blocks,
+)
+
+
+# The available ways of reading StreamField content: "streamvalue" walks the
+# StreamValue objects Wagtail builds for each field, "raw" walks the stored
+# JSON against the block definitions, "database" aggregates the stored JSON
+# in PostgreSQL (falling back to "raw" on other databases), and "index"
+# aggregates the IndexedBlockUsage table.
+ENGINES = ("streamvalue", "raw", "database", "index")
+
+# The periods revisions can be bucketed by when auditing revision history,
+# as accepted by django.db.models.functions.Trunc
+PERIODS = ("year", "quarter", "month", "week", "day")
 
 
 @dataclass
@@ -26,11 +78,20 @@ class AuditedBlock:
     field: str
     path: str
     block: type
-    pages: list
+    page_ids: array = field(default_factory=lambda: array("q"))
     total_occurrences: int = 0
     pages_count: int = 0
     pages_live_count: int = 0
     pages_in_default_site_count: int = 0
+    pages_per_site_count: dict = field(default_factory=dict)
+    revisions_count: int = 0
+    revisions_by_period: dict = field(default_factory=dict)
+    last_used_at: datetime = None
+
+    @property
+    def pages(self):
+        """A lazy queryset of the pages this block is used on"""
+        return Page.objects.filter(pk__in=self.page_ids).specific()
 
 
 # Traverse a stream field and yield back each available block type
@@ -42,7 +103,6 @@ def traverse_streamblock(page_model, block, parent=None):
         field=None,
         path=(parent + "." + block_name if parent is not None else block_name),
         block=dotted_name(block.__class__),
-        pages=[],
     )
 
     yield audited_block
@@ -67,40 +127,324 @@ def traverse_streamblock(page_model, block, parent=None):
         pass
 
 
+@cache
+def get_streamfield_block_tree(page_model, streamfield_name):
+    """Return a tuple of (path, dotted block class name) for every block a
+    page model's StreamField can use
+
+    The tree is computed once per process. Its strings are interned, so the
+    AuditedBlocks built from it for each audit share them rather than
+    allocating new ones."""
+    streamfield = page_model._meta.get_field(streamfield_name)
+
+    # Traverse child blocks of this stream field (this avoids capturing the
+    # containing stream block, so we can line-up with stream values)
+    return tuple(
+        (sys.intern(audited_block.path), sys.intern(audited_block.block))
+        for child_block in streamfield.stream_block.child_blocks.values()
+        for audited_block in traverse_streamblock(page_model, child_block)
+    )
+
+
+@cache
+def get_streamfield_path_ids(page_model, streamfield_name):
+    """Return a tuple of the block paths a page model's StreamField can use,
+    and a dictionary of (parent path ID, block name) to child path ID
+
+    A path's ID is its index in the tuple, and top-level blocks have a parent
+    path ID of None, so StreamField values can be traversed without building
+    a path string for every block."""
+    paths = tuple(
+        dict.fromkeys(
+            path
+            for path, block in get_streamfield_block_tree(
+                page_model, streamfield_name
+            )
+        )
+    )
+    path_ids = {path: path_id for path_id, path in enumerate(paths)}
+    transitions = {}
+    for path_id, path in enumerate(paths):
+        parent, _, block_name = path.rpartition(".")
+        parent_id = path_ids[parent] if parent != "" else None
+        transitions[parent_id, block_name] = path_id
+    return paths, transitions
+
+
+def get_path_id_lookup(transitions):
+    """Return a child_path function for the walkers that looks up path IDs
+    in the transitions from get_streamfield_path_ids()"""
+
+    def child_path(parent, block_name):
+        return transitions[parent, block_name]
+
+    return child_path
+
+
+def join_path(parent, block_name):
+    """Return the path of a child block from its parent's path"""
+    return parent + "." + block_name if parent is not None else block_name
+
+
 # Traverse a stream field's value and yield back each block type in use
-def traverse_streamvalue(value, parent=None):
-    """Walk model stream value objects to get AuditedBlocks in-use"""
+def traverse_streamvalue(value, parent=None, child_path=join_path):
+    """Walk model stream value objects to get AuditedBlocks in-use
+
+    child_path(parent, block_name) returns the path of each block, which can
+    be a string or, with get_streamfield_path_ids(), an integer path ID."""
 
     # This is a block type
     if isinstance(value, BoundBlock):
         block_name = value.block.name if value.block.name != "" else "item"
-        path = parent + "." + block_name if parent is not None else block_name
+        path = child_path(parent, block_name)
         yield path
-        yield from traverse_streamvalue(value.value, parent=path)
+        yield from traverse_streamvalue(
+            value.value, parent=path, child_path=child_path
+        )
 
     # This is a StructValue
     elif isinstance(value, StructValue):
         for child in value.bound_blocks.values():
-            yield from traverse_streamvalue(child, parent=parent)
+            yield from traverse_streamvalue(
+                child, parent=parent, child_path=child_path
+            )
 
     elif isinstance(value, ListValue):
         for child in value.bound_blocks:
-            yield from traverse_streamvalue(child, parent=parent)
+            yield from traverse_streamvalue(
+                child, parent=parent, child_path=child_path
+            )
 
     elif isinstance(value, TypedTable):
         for row in value.rows:
             for child in row:
-                yield from traverse_streamvalue(child, parent=parent)
+                yield from traverse_streamvalue(
+                    child, parent=parent, child_path=child_path
+                )
 
     # This is a sequence of blocks
     elif isinstance(value, StreamValue):
         for child in value:
-            yield from traverse_streamvalue(child, parent=parent)
+            yield from traverse_streamvalue(
+                child, parent=parent, child_path=child_path
+            )
+
+
+# Traverse a stream field's raw JSON and yield back each block type in use
+def traverse_raw_streamvalue(block, value, parent=None, child_path=join_path):
+    """Walk raw stream JSON against block definitions to get AuditedBlocks
+    in-use, without converting the JSON into StreamValue objects"""
+
+    def get_child_path(parent, child_block, position):
+        block_name = child_block.name if child_block.name != "" else "item"
+        return child_path(parent, block_name)
+
+    for _, _, path in walk_raw_blocks(block, value, parent, get_child_path):
+        yield path
+
+
+class BlockCounters:
+    """Array-backed block usage counts for a StreamField, indexed by path
+    ID"""
+
+    def __init__(self, size):
+        self.total_occurrences = array("q", bytes(8 * size))
+        self.pages_count = array("q", bytes(8 * size))
+        self.pages_live_count = array("q", bytes(8 * size))
+        self.pages_in_default_site_count = array("q", bytes(8 * size))
+
+        self.pages_per_site_count = defaultdict(
+            lambda: array("q", bytes(8 * size))
+        )
+
+        # The last page each path was seen on, to count each page once
+        self.last_page_ids = array("q", [-1]) * size
+
+    def get_page_counters(self, live, in_default_site, site_id):
+        """Return the arrays to count a page in for each block path first
+        seen on it"""
+        page_counters = [self.pages_count]
+        if live:
+            page_counters.append(self.pages_live_count)
+        if in_default_site:
+            page_counters.append(self.pages_in_default_site_count)
+        if site_id is not None:
+            page_counters.append(self.pages_per_site_count[site_id])
+        return page_counters
+
+    def update_audited_blocks(self, audited_blocks):
+        """Add the counts to a list of AuditedBlocks indexed by path ID"""
+        for path_id, audited_block in enumerate(audited_blocks):
+            audited_block.total_occurrences += self.total_occurrences[path_id]
+            audited_block.pages_count += self.pages_count[path_id]
+            audited_block.pages_live_count += self.pages_live_count[path_id]
+            audited_block.pages_in_default_site_count += (
+                self.pages_in_default_site_count[path_id]
+            )
+            for site_id, site_count in self.pages_per_site_count.items():
+                if site_count[path_id] > 0:
+                    add_site_count(audited_block, site_id, site_count[path_id])
+
+
+class RevisionCounters(BlockCounters):
+    """Array-backed block usage counts for a StreamField across revisions,
+    indexed by path ID"""
+
+    def __init__(self, size):
+        super().__init__(size)
+        self.revisions_count = array("q", bytes(8 * size))
+        self.revisions_by_period = defaultdict(
+            lambda: array("q", bytes(8 * size))
+        )
+        self.last_used_at = [None] * size
+
+        # The last revision each path was seen in, to count each revision once
+        self.last_revision_ids = array("q", [-1]) * size
+
+    def update_audited_blocks(self, audited_blocks):
+        super().update_audited_blocks(audited_blocks)
+        for path_id, audited_block in enumerate(audited_blocks):
+            audited_block.revisions_count += self.revisions_count[path_id]
+            for period, period_count in sorted(
+                self.revisions_by_period.items()
+            ):
+                if period_count[path_id] > 0:
+                    audited_block.revisions_by_period[period] = (
+                        audited_block.revisions_by_period.get(period, 0)
+                        + period_count[path_id]
+                    )
+            if self.last_used_at[path_id] is not None and (
+                audited_block.last_used_at is None
+                or self.last_used_at[path_id] > audited_block.last_used_at
+            ):
+                audited_block.last_used_at = self.last_used_at[path_id]
+
+
+def add_site_count(audited_block, site_id, pages_count):
+    """Add to the count of pages in a site an AuditedBlock is used on"""
+    audited_block.pages_per_site_count[site_id] = (
+        audited_block.pages_per_site_count.get(site_id, 0) + pages_count
+    )
+
+
+def merge_page_blocks(page_blocks, other_page_blocks):
+    """Add the counts from one audit of a page model into another
+
+    The two audits must have been of different pages, as they are when a page
+    model is split into shards by page ID."""
+    for streamfield_name, streamfield_dict in other_page_blocks.items():
+        for block_path, other_block in streamfield_dict.items():
+            audited_block = page_blocks[streamfield_name][block_path]
+            audited_block.page_ids.extend(other_block.page_ids)
+            audited_block.total_occurrences += other_block.total_occurrences
+            audited_block.pages_count += other_block.pages_count
+            audited_block.pages_live_count += other_block.pages_live_count
+            audited_block.pages_in_default_site_count += (
+                other_block.pages_in_default_site_count
+            )
+            for (
+                site_id,
+                pages_count,
+            ) in other_block.pages_per_site_count.items():
+                add_site_count(audited_block, site_id, pages_count)
+    return page_blocks
+
+
+def dump_page_blocks(page_blocks):
+    """Return the counts of a page model's AuditedBlocks as JSON-compatible
+    data, without their page IDs"""
+    return {
+        streamfield_name: {
+            block_path: [
+                audited_block.total_occurrences,
+                audited_block.pages_count,
+                audited_block.pages_live_count,
+                audited_block.pages_in_default_site_count,
+                audited_block.pages_per_site_count,
+            ]
+            for block_path, audited_block in streamfield_dict.items()
+        }
+        for streamfield_name, streamfield_dict in page_blocks.items()
+    }
+
+
+def load_page_blocks(page_blocks, data):
+    """Restore counts from dump_page_blocks() into a page model's
+    AuditedBlocks"""
+    for streamfield_name, streamfield_data in data.items():
+        for block_path, block_data in streamfield_data.items():
+            audited_block = page_blocks[streamfield_name].get(block_path)
+            if audited_block is None:
+                continue
+            (
+                audited_block.total_occurrences,
+                audited_block.pages_count,
+                audited_block.pages_live_count,
+                audited_block.pages_in_default_site_count,
+                pages_per_site_count,
+            ) = block_data
+            # JSON object keys are strings
+            audited_block.pages_per_site_count = {
+                int(site_id): pages_count
+                for site_id, pages_count in pages_per_site_count.items()
+            }
+    return page_blocks
+
+
+def get_page_ids_lengths(page_blocks):
+    """Return how many page IDs each of a page model's AuditedBlocks has"""
+    return {
+        (streamfield_name, block_path): len(audited_block.page_ids)
+        for streamfield_name, streamfield_dict in page_blocks.items()
+        for block_path, audited_block in streamfield_dict.items()
+    }
+
+
+def dump_page_ids(page_blocks, page_ids_lengths):
+    """Return the page IDs added to a page model's AuditedBlocks since
+    get_page_ids_lengths() as JSON-compatible data, with page IDs as
+    base64-encoded arrays"""
+    data = {}
+    for streamfield_name, streamfield_dict in page_blocks.items():
+        for block_path, audited_block in streamfield_dict.items():
+            page_ids = audited_block.page_ids[
+                page_ids_lengths[streamfield_name, block_path] :
+            ]
+            if len(page_ids) > 0:
+                data.setdefault(streamfield_name, {})[block_path] = (
+                    base64.b64encode(page_ids.tobytes()).decode()
+                )
+    return data
+
+
+def load_page_ids(page_blocks, data):
+    """Add page IDs from dump_page_ids() to a page model's AuditedBlocks"""
+    for streamfield_name, streamfield_data in data.items():
+        for block_path, page_ids in streamfield_data.items():
+            audited_block = page_blocks[streamfield_name].get(block_path)
+            if audited_block is None:
+                continue
+            audited_block.page_ids.frombytes(base64.b64decode(page_ids))
+    return page_blocks
+
+
+def audit_page_model_shard(queryset, page_model, page_id_range):
+    """Audit a range of page IDs of a page model in a worker process, and
+    return its blocks and the worker's AuditStats, if stats are kept"""
+    if queryset.stats is not None:
+        queryset.stats = AuditStats()
+    page_blocks = queryset.audit_blocks_for_page_model(
+        page_model, page_id_range=page_id_range
+    )
+    return page_blocks, queryset.stats
 
 
 class BlockUsageQuerySet(Queryish):
     """Return a QuerySet-like object for querying block type usage"""
 
+    # The AuditStats of the last query run with stats=True
+    stats = None
+
     def get_filtered_page_models(self):
         global_page_models = get_page_models()
         filters = [val for key, val in self.filters if key == "page_model"]
@@ -121,79 +465,735 @@ class BlockUsageQuerySet(Queryish):
         ]
         return filtered_fields if len(filters) > 0 else all_streamfields
 
-    def audit_blocks_for_page_model(self, page_model):
+    def get_engine(self):
+        engine = get_filter_value(self.filters, "engine", "streamvalue")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown block usage engine: {engine}")
+        return engine
+
+    def get_revisions(self):
+        return get_filter_value(self.filters, "revisions", False)
+
+    def get_period(self):
+        period = get_filter_value(self.filters, "period", "month")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown revision period: {period}")
+        return period
+
+    def get_block_path_ids(
+        self,
+        streamfield,
+        streamfield_value,
+        child_path,
+        raw,
+        page_id=None,
+        traversal_batch=None,
+    ):
+        """Return the path ID of each block in use in a StreamField value,
+        given a child_path function from get_path_id_lookup(), walking the
+        stored JSON if raw is true
+
+        Traversals are memoized in traversal_batch, a TraversalBatch, if one
+        is given."""
+
+        def traverse():
+            if raw:
+                # Reading raw_data on the lazy StreamValue leaves the stored
+                # JSON as-is, skipping BoundBlock construction and
+                # bulk_to_python()
+                return traverse_raw_streamvalue(
+                    streamfield.stream_block,
+                    streamfield_value.raw_data,
+                    child_path=child_path,
+                )
+            return traverse_streamvalue(
+                streamfield_value, child_path=child_path
+            )
+
+        if traversal_batch is not None:
+            return traversal_batch.memoize(
+                streamfield, page_id, streamfield_value, traverse
+            )
+        return memoize_traversal(
+            "block_path_ids", streamfield, page_id, streamfield_value, traverse
+        )
+
+    def get_chunk_size(self):
+        return get_filter_value(self.filters, "chunk_size", 2000)
+
+    def get_stats(self):
+        return get_filter_value(self.filters, "stats", False)
+
+    def can_audit_in_database(self, page_queryset):
+        return (
+            self.get_engine() == "database"
+            and connections[page_queryset.db].vendor == "postgresql"
+        )
+
+    def aggregate_blocks_in_database(
+        self, page_model, page_blocks, page_queryset, site, sites
+    ):
+        """Fill in AuditedBlock counts with aggregate queries"""
+        page_queryset = page_queryset.annotate(
+            site_id=get_site_id_expression(sites)
+        )
+        for streamfield_name, streamfield_dict in page_blocks.items():
+            streamfield = page_model._meta.get_field(streamfield_name)
+            block_usage = audit_blocks_in_database(
+                page_queryset, streamfield, site.root_page.path
+            )
+            for block_path, (
+                total_occurrences,
+                pages_count,
+                pages_live_count,
+                pages_in_default_site_count,
+                page_ids,
+                site_ids,
+            ) in block_usage.items():
+                audited_block = streamfield_dict[block_path]
+                audited_block.total_occurrences = total_occurrences
+                audited_block.pages_count = pages_count
+                audited_block.pages_live_count = pages_live_count
+                audited_block.pages_in_default_site_count = (
+                    pages_in_default_site_count
+                )
+                audited_block.page_ids = array("q", page_ids)
+                audited_block.pages_per_site_count = dict(
+                    Counter(
+                        site_id for site_id in site_ids if site_id is not None
+                    )
+                )
+
+    def get_workers(self):
+        return get_filter_value(self.filters, "workers", 1)
+
+    def get_page_id_ranges(self, page_model, shards):
+        """Split the IDs of a page model's pages into up to `shards` ranges"""
+        page_ids = page_model.objects.exact_type(page_model).aggregate(
+            low=Min("pk"), high=Max("pk")
+        )
+        low, high = page_ids["low"], page_ids["high"]
+        if low is None:
+            return []
+
+        step = math.ceil((high - low + 1) / shards)
+        return [
+            (start, min(start + step - 1, high))
+            for start in range(low, high + 1, step)
+        ]
+
+    def get_executor(self, workers):
+        """Return the pool of worker processes to audit shards in"""
+        # Spawn rather than fork, so that each worker sets up Django and opens
+        # its own database connections instead of sharing this process's
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    def audit_blocks_in_parallel(self, page_models):
+        """Audit page models in a pool of worker processes, each page model
+        split into shards by page ID, and yield each page model's blocks"""
+        workers = self.get_workers()
+        shards = [
+            (page_model, page_id_range)
+            for page_model in page_models
+            for page_id_range in self.get_page_id_ranges(page_model, workers)
+        ]
+
+        executor = self.get_executor(workers)
+        try:
+            shard_futures = [
+                (
+                    page_model,
+                    executor.submit(
+                        audit_page_model_shard, self, page_model, page_id_range
+                    ),
+                )
+                for page_model, page_id_range in shards
+            ]
+
+            # Yield each page model's blocks as soon as its shards are done
+            for page_model in page_models:
+                page_blocks = self.get_available_blocks(page_model)
+                for shard_page_model, shard_future in shard_futures:
+                    if shard_page_model is not page_model:
+                        continue
+                    shard_blocks, shard_stats = shard_future.result()
+                    merge_page_blocks(page_blocks, shard_blocks)
+                    if shard_stats is not None:
+                        self.stats.merge(shard_stats)
+                yield page_blocks
+
+        finally:
+            # If the caller stops early, don't wait for shards it won't need
+            executor.shutdown(cancel_futures=True)
+
+    def aggregate_blocks_from_index(
+        self, page_blocks, page_queryset, site, sites
+    ):
+        """Fill in AuditedBlock counts from the block usage index"""
+        root_page = site.root_page
+        indexed_block_usage = IndexedBlockUsage.objects.filter(
+            page__in=page_queryset.values("pk"), field__in=page_blocks.keys()
+        ).order_by()
+
+        block_usage = indexed_block_usage.values("field", "path").annotate(
+            total_occurrences=Sum("occurrences"),
+            pages_count=Count("page"),
+            pages_live_count=Count("page", filter=Q(page__live=True)),
+            pages_in_default_site_count=Count(
+                "page",
+                filter=Q(
+                    page__path__startswith=root_page.path,
+                    page__depth__gt=root_page.depth,
+                ),
+            ),
+        )
+        for usage in block_usage:
+            # The index may hold paths for blocks that have since been
+            # removed from the StreamField
+            audited_block = page_blocks[usage["field"]].get(usage["path"])
+            if audited_block is not None:
+                audited_block.total_occurrences = usage["total_occurrences"]
+                audited_block.pages_count = usage["pages_count"]
+                audited_block.pages_live_count = usage["pages_live_count"]
+                audited_block.pages_in_default_site_count = usage[
+                    "pages_in_default_site_count"
+                ]
+
+        site_usage = (
+            indexed_block_usage.annotate(
+                site_id=get_site_id_expression(sites, prefix="page__")
+            )
+            .values("field", "path", "site_id")
+            .annotate(pages_count=Count("page"))
+        )
+        for usage in site_usage:
+            audited_block = page_blocks[usage["field"]].get(usage["path"])
+            if audited_block is not None and usage["site_id"] is not None:
+                audited_block.pages_per_site_count[usage["site_id"]] = usage[
+                    "pages_count"
+                ]
+
+        for streamfield_name, block_path, page_id in (
+            indexed_block_usage.values_list("field", "path", "page_id")
+            .order_by("page_id")
+            .iterator(chunk_size=self.get_chunk_size())
+        ):
+            audited_block = page_blocks[streamfield_name].get(block_path)
+            if audited_block is not None:
+                audited_block.page_ids.append(page_id)
+
+    def get_available_blocks(self, page_model):
+        """Return a dictionary of StreamField names to dictionaries of block
+        paths to AuditedBlocks, for every block a page model can use"""
         # Get the StreamFields on the page model
         streamfields = self.get_filtered_streamfield_names(page_model)
 
         # A dictionary to hold counts of each block on a page
         page_blocks = {}
+        page_model_name = dotted_name(page_model)
 
         # First populate all available blocks
         for streamfield_name in streamfields:
-            streamfield = page_model._meta.get_field(streamfield_name)
-            page_blocks[streamfield_name] = {}
+            page_blocks[streamfield_name] = {
+                path: AuditedBlock(
+                    page_model=page_model_name,
+                    field=streamfield_name,
+                    path=path,
+                    block=block,
+                )
+                for path, block in get_streamfield_block_tree(
+                    page_model, streamfield_name
+                )
+            }
 
-            # Traverse child blocks of this stream field (this avoids capturing
-            # the containing stream block, so we can line-up with stream values
-            # below)
-            for child_block_name in streamfield.stream_block.child_blocks:
-                for audited_block in traverse_streamblock(
-                    page_model,
-                    streamfield.stream_block.child_blocks[child_block_name],
-                ):
-                    audited_block.field = streamfield_name
-                    page_blocks[streamfield_name][audited_block.path] = (
-                        audited_block
-                    )
+        return page_blocks
+
+    def audit_blocks_for_page_model(self, page_model, page_id_range=None):
+        # Get the StreamFields on the page model
+        streamfields = self.get_filtered_streamfield_names(page_model)
+
+        # First populate all available blocks
+        page_blocks = self.get_available_blocks(page_model)
 
-        # Get the default Wagtail site (this avoids the Trash)
-        site = Site.objects.get(is_default_site=True)
+        # Get every Wagtail site, to count the pages in each, and the default
+        # site (this avoids the Trash)
+        sites = list(Site.objects.select_related("root_page"))
+        site = next((site for site in sites if site.is_default_site), None)
+        if site is None:
+            raise Site.DoesNotExist("There is no default site.")
 
         # Get a queryset for all pages of this type
         page_queryset = page_model.objects.exact_type(page_model)
+        if page_id_range is not None:
+            page_queryset = page_queryset.filter(id__range=page_id_range)
+
+        if self.can_audit_in_database(page_queryset):
+            self.aggregate_blocks_in_database(
+                page_model, page_blocks, page_queryset, site, sites
+            )
+            return page_blocks
+
+        if self.get_engine() == "index":
+            self.aggregate_blocks_from_index(
+                page_blocks, page_queryset, site, sites
+            )
+            return page_blocks
+
+        # Stream only the columns needed for each page, rather than loading
+        # every page into the queryset's result cache
+        page_rows = self.get_page_rows(
+            page_queryset, site, streamfields
+        ).iterator(chunk_size=self.get_chunk_size())
+        streamfield_counters = self.get_streamfield_counters(
+            page_model, page_blocks
+        )
+        self.count_page_rows(
+            page_rows,
+            streamfield_counters,
+            SiteRootPaths(sites),
+            page_model=page_model,
+        )
+
+        for _, _, audited_blocks, counters in streamfield_counters:
+            counters.update_audited_blocks(audited_blocks)
+
+        return page_blocks
+
+    def get_page_rows(self, page_queryset, site, streamfields):
+        """Return a values_list queryset of the columns needed to audit each
+        page. Whether each page is in the default site is resolved in the
+        query rather than per block."""
+        root_page = site.root_page
+        return page_queryset.annotate(
+            in_default_site=ExpressionWrapper(
+                Q(
+                    path__startswith=root_page.path,
+                    depth__gt=root_page.depth,
+                ),
+                output_field=BooleanField(),
+            )
+        ).values_list("pk", "live", "path", "in_default_site", *streamfields)
+
+    def get_streamfield_counters(
+        self, page_model, page_blocks, counters_class=BlockCounters
+    ):
+        """Return the StreamField, child_path function to look up path IDs
+        with, AuditedBlocks indexed by path ID, and counters_class instance
+        to count each StreamField's blocks in
+
+        Blocks are counted into arrays indexed by path ID, and the counts
+        are only copied into the AuditedBlocks once pages have been
+        traversed."""
+        streamfield_counters = []
+        for streamfield_name in page_blocks:
+            paths, transitions = get_streamfield_path_ids(
+                page_model, streamfield_name
+            )
+            streamfield_counters.append(
+                (
+                    page_model._meta.get_field(streamfield_name),
+                    get_path_id_lookup(transitions),
+                    [page_blocks[streamfield_name][path] for path in paths],
+                    counters_class(len(paths)),
+                )
+            )
+        return streamfield_counters
+
+    def count_page_rows(
+        self, page_rows, streamfield_counters, site_root_paths, page_model=None
+    ):
+        """Loop through rows from get_page_rows(), and count the blocks in
+        each of their StreamFields"""
+        if self.stats is not None:
+            page_rows = self.count_scanned_pages(page_rows)
+
+        # Resolve the engine once rather than for every page and field
+        raw = self.get_engine() in ("raw", "database")
+
+        traversal_batch = TraversalBatch("block_path_ids")
+        if traversal_batch.traversal_cache is not None:
+            page_rows = self.load_traversal_batches(
+                page_rows,
+                [streamfield for streamfield, *_ in streamfield_counters],
+                traversal_batch,
+            )
+
+        for (
+            page_id,
+            live,
+            path,
+            in_default_site,
+            *streamfield_values,
+        ) in page_rows:
+            page_site = site_root_paths.get_site(path)
+            site_id = page_site.pk if page_site is not None else None
+
+            for streamfield_counter, streamfield_value in zip(
+                streamfield_counters, streamfield_values, strict=True
+            ):
+                streamfield, child_path, audited_blocks, counters = (
+                    streamfield_counter
+                )
+
+                # The counts a page is added to are the same for every block
+                # path on it
+                page_counters = counters.get_page_counters(
+                    live, in_default_site, site_id
+                )
+
+                path_ids = self.get_block_path_ids(
+                    streamfield,
+                    streamfield_value,
+                    child_path,
+                    raw,
+                    page_id=page_id,
+                    traversal_batch=traversal_batch,
+                )
+                if self.stats is not None:
+                    path_ids = self.stats.timed(
+                        path_ids,
+                        self.stats.field_times,
+                        f"{dotted_name(page_model)}.{streamfield.name}",
+                    )
+
+                for path_id in path_ids:
+                    counters.total_occurrences[path_id] += 1
+
+                    # Each page is only visited once, so a block is counted
+                    # for a page the first time its path is seen on that page
+                    if counters.last_page_ids[path_id] != page_id:
+                        counters.last_page_ids[path_id] = page_id
+                        audited_blocks[path_id].page_ids.append(page_id)
 
-        # Loop through the queryset, and traverse each streamfield
-        for page in page_queryset:
-            for streamfield_name in streamfields:
-                streamfield_value = getattr(page, streamfield_name)
-                streamfield_dict = page_blocks[streamfield_name]
+                        for page_counter in page_counters:
+                            page_counter[path_id] += 1
 
-                for block_path in traverse_streamvalue(streamfield_value):
-                    # Get the AuditedBlock object for this path
-                    audited_block = streamfield_dict[block_path]
+    def load_traversal_batches(self, page_rows, streamfields, traversal_batch):
+        """Yield rows from get_page_rows(), looking up the cached traversals
+        of each chunk of rows' StreamFields before they are counted, and
+        saving new ones after"""
+        page_rows = iter(page_rows)
+        try:
+            while rows := list(
+                itertools.islice(page_rows, self.get_chunk_size())
+            ):
+                traversal_batch.load(
+                    (streamfield, page_id, streamfield_value)
+                    for page_id, _, _, _, *streamfield_values in rows
+                    for streamfield, streamfield_value in zip(
+                        streamfields, streamfield_values, strict=True
+                    )
+                )
+                yield from rows
+        finally:
+            traversal_batch.save()
+
+    def count_scanned_pages(self, rows):
+        """Yield rows of pages or revisions, counting each as scanned"""
+        for row in rows:
+            self.stats.pages_scanned += 1
+            yield row
+
+    def get_checkpoint_name(self):
+        return get_filter_value(self.filters, "checkpoint")
+
+    def get_resume(self):
+        return get_filter_value(self.filters, "resume", False)
 
-                    audited_block.total_occurrences += 1
+    def get_audit_definition(self):
+        """Return the options that determine an audit's results, to tell
+        whether a checkpoint is for the same audit"""
+        return {
+            "page_models": [
+                dotted_name(page_model)
+                for page_model in self.get_filtered_page_models()
+            ],
+            "fields": sorted(
+                val for key, val in self.filters if key == "field"
+            ),
+            "engine": self.get_engine(),
+        }
+
+    def get_checkpoint(self, name):
+        """Return the named BlockUsageCheckpoint, started afresh unless the
+        audit is being resumed"""
+        if self.get_engine() not in ("streamvalue", "raw"):
+            raise ValueError(
+                "Checkpointed audits must use the streamvalue or raw engine."
+            )
+        if self.get_revisions() or self.get_workers() > 1:
+            raise ValueError(
+                "Checkpointed audits can't audit revisions or use workers."
+            )
 
-                    if page not in audited_block.pages:
-                        audited_block.pages.append(page)
+        audit_definition = self.get_audit_definition()
+        checkpoint, created = BlockUsageCheckpoint.objects.get_or_create(
+            name=name, defaults={"audit": audit_definition}
+        )
+        if created or not self.get_resume():
+            checkpoint.audit = audit_definition
+            checkpoint.completed_page_models = []
+            checkpoint.page_model = ""
+            checkpoint.last_page_id = None
+            checkpoint.blocks = {}
+            checkpoint.save()
+            checkpoint.batches.all().delete()
+        elif checkpoint.audit != audit_definition:
+            raise ValueError(
+                f"Checkpoint {name} is for a different audit, and can't be "
+                "resumed."
+            )
+        return checkpoint
+
+    def audit_blocks_with_checkpoint(self, page_model, checkpoint):
+        """Audit a page model's pages in batches ordered by page ID, saving
+        the counts so far, the last page ID counted, and the batch's page
+        IDs to the checkpoint after each batch, and continuing from the
+        checkpoint's progress"""
+        page_model_name = dotted_name(page_model)
+        page_blocks = self.get_available_blocks(page_model)
+        load_page_blocks(
+            page_blocks, checkpoint.blocks.get(page_model_name, {})
+        )
+        for page_ids in (
+            checkpoint.batches.filter(page_model=page_model_name)
+            .order_by("pk")
+            .values_list("page_ids", flat=True)
+        ):
+            load_page_ids(page_blocks, page_ids)
+        if page_model_name in checkpoint.completed_page_models:
+            return page_blocks
+
+        last_page_id = (
+            checkpoint.last_page_id
+            if checkpoint.page_model == page_model_name
+            else None
+        )
 
-                        audited_block.pages_count += 1
+        sites = list(Site.objects.select_related("root_page"))
+        site = next((site for site in sites if site.is_default_site), None)
+        if site is None:
+            raise Site.DoesNotExist("There is no default site.")
+        site_root_paths = SiteRootPaths(sites)
 
-                        if page.live:
-                            audited_block.pages_live_count += 1
+        page_rows = self.get_page_rows(
+            page_model.objects.exact_type(page_model),
+            site,
+            self.get_filtered_streamfield_names(page_model),
+        ).order_by("pk")
+        batch_size = self.get_chunk_size()
 
-                        if page.is_descendant_of(site.root_page):
-                            audited_block.pages_in_default_site_count += 1
+        while True:
+            batch_rows = page_rows
+            if last_page_id is not None:
+                batch_rows = batch_rows.filter(pk__gt=last_page_id)
+            batch = list(batch_rows[:batch_size])
+            if len(batch) == 0:
+                break
 
+            page_ids_lengths = get_page_ids_lengths(page_blocks)
+            streamfield_counters = self.get_streamfield_counters(
+                page_model, page_blocks
+            )
+            self.count_page_rows(
+                batch,
+                streamfield_counters,
+                site_root_paths,
+                page_model=page_model,
+            )
+            for _, _, audited_blocks, counters in streamfield_counters:
+                counters.update_audited_blocks(audited_blocks)
+
+            # Only the batch's page IDs are saved, so the checkpoint's size
+            # doesn't grow with the pages audited so far
+            last_page_id = batch[-1][0]
+            with transaction.atomic():
+                checkpoint.batches.create(
+                    page_model=page_model_name,
+                    last_page_id=last_page_id,
+                    page_ids=dump_page_ids(page_blocks, page_ids_lengths),
+                )
+                checkpoint.page_model = page_model_name
+                checkpoint.last_page_id = last_page_id
+                checkpoint.blocks[page_model_name] = dump_page_blocks(
+                    page_blocks
+                )
+                checkpoint.save()
+
+        checkpoint.completed_page_models.append(page_model_name)
+        checkpoint.blocks[page_model_name] = dump_page_blocks(page_blocks)
+        checkpoint.save()
         return page_blocks
 
+    def audit_revisions_for_page_model(self, page_model):
+        """Audit the block usage of every revision of a page model's pages
+
+        Revisions are streamed in chunks, fetching only the StreamFields from
+        their content, and their raw JSON is walked against the page model's
+        block definitions. Each block's revisions are counted by the period
+        they were created in."""
+        streamfields = self.get_filtered_streamfield_names(page_model)
+        page_blocks = self.get_available_blocks(page_model)
+
+        # Ordering by page means each page's revisions are together, so pages
+        # can be counted once per block like they are for page rows
+        revision_rows = (
+            Revision.objects.filter(
+                content_type=ContentType.objects.get_for_model(page_model)
+            )
+            .annotate(
+                period=Trunc(
+                    "created_at", self.get_period(), output_field=DateField()
+                )
+            )
+            .order_by("object_id", "created_at")
+            .values_list(
+                "pk",
+                "object_id",
+                "created_at",
+                "period",
+                *(f"content__{name}" for name in streamfields),
+            )
+            .iterator(chunk_size=self.get_chunk_size())
+        )
+        if self.stats is not None:
+            revision_rows = self.count_scanned_pages(revision_rows)
+
+        streamfield_counters = self.get_streamfield_counters(
+            page_model, page_blocks, counters_class=RevisionCounters
+        )
+
+        for (
+            revision_id,
+            object_id,
+            created_at,
+            period,
+            *streamfield_values,
+        ) in revision_rows:
+            page_id = int(object_id)
+            for streamfield_counter, streamfield_value in zip(
+                streamfield_counters, streamfield_values, strict=True
+            ):
+                streamfield, child_path, audited_blocks, counters = (
+                    streamfield_counter
+                )
+
+                # Revision content holds StreamFields as JSON strings, which
+                # some databases return encoded as JSON again
+                while isinstance(streamfield_value, str):
+                    if self.stats is not None:
+                        self.stats.count_json_bytes(streamfield_value)
+                    streamfield_value = json.loads(streamfield_value)
+
+                period_counter = counters.revisions_by_period[period]
+                for path_id in traverse_raw_streamvalue(
+                    streamfield.stream_block,
+                    streamfield_value,
+                    child_path=child_path,
+                ):
+                    counters.total_occurrences[path_id] += 1
+
+                    if counters.last_revision_ids[path_id] != revision_id:
+                        counters.last_revision_ids[path_id] = revision_id
+                        counters.revisions_count[path_id] += 1
+                        period_counter[path_id] += 1
+
+                    # Revisions are ordered by page, so the latest revision
+                    # using a block may have been seen earlier
+                    last_used_at = counters.last_used_at[path_id]
+                    if last_used_at is None or created_at > last_used_at:
+                        counters.last_used_at[path_id] = created_at
+
+                    if counters.last_page_ids[path_id] != page_id:
+                        counters.last_page_ids[path_id] = page_id
+                        counters.pages_count[path_id] += 1
+                        audited_blocks[path_id].page_ids.append(page_id)
+
+        for _, _, audited_blocks, counters in streamfield_counters:
+            counters.update_audited_blocks(audited_blocks)
+
+        return page_blocks
+
+    def get_timed_page_blocks(self, page_models, all_page_blocks):
+        """Yield each page model's blocks, adding the time taken to audit
+        them and the number of blocks found to the stats"""
+        all_page_blocks = iter(all_page_blocks)
+        for page_model in page_models:
+            start = perf_counter()
+            page_blocks = next(all_page_blocks)
+            self.stats.page_model_times[dotted_name(page_model)] += (
+                perf_counter() - start
+            )
+            self.stats.blocks_visited += sum(
+                audited_block.total_occurrences
+                for blocks in page_blocks.values()
+                for audited_block in blocks.values()
+            )
+            yield page_blocks
+
     def run_query(self):
-        audited_blocks = []
+        if self.get_stats():
+            self.stats = AuditStats()
+            return self.stats.measure_query(self, self.audit_blocks())
+        return self.audit_blocks()
 
-        for page_model in self.get_filtered_page_models():
-            page_blocks = self.audit_blocks_for_page_model(page_model)
+    def audit_blocks(self):
+        page_models = self.get_filtered_page_models()
+        checkpoint_name = self.get_checkpoint_name()
+        if checkpoint_name is not None:
+            checkpoint = self.get_checkpoint(checkpoint_name)
+            all_page_blocks = (
+                self.audit_blocks_with_checkpoint(page_model, checkpoint)
+                for page_model in page_models
+            )
+        elif self.get_revisions():
+            all_page_blocks = (
+                self.audit_revisions_for_page_model(page_model)
+                for page_model in page_models
+            )
+        elif self.get_workers() > 1:
+            all_page_blocks = self.audit_blocks_in_parallel(page_models)
+        else:
+            all_page_blocks = (
+                self.audit_blocks_for_page_model(page_model)
+                for page_model in page_models
+            )
 
-            # Flatten the dictionary of dictionaries of blocks to a list and
-            # extend the audited block list
-            audited_blocks.extend(
-                block
-                for streamfield, blocks in page_blocks.items()
-                for block in blocks.values()
+        if self.stats is not None:
+            all_page_blocks = self.get_timed_page_blocks(
+                page_models, all_page_blocks
             )
 
+        # Flatten the dictionaries of dictionaries of blocks for each page
+        # model. Page models are only audited as their blocks are consumed.
+        audited_blocks = (
+            block
+            for page_blocks in all_page_blocks
+            for streamfield, blocks in page_blocks.items()
+            for block in blocks.values()
+        )
+
         # self.ordering
 
-        # Slice based on queryset slicing offset/limit
-        return audited_blocks[
-            self.offset : self.offset + self.limit if self.limit else None
-        ]
+        # Slice based on queryset slicing offset/limit, which stops auditing
+        # once enough blocks have been found
+        yield from itertools.islice(
+            audited_blocks,
+            self.offset,
+            self.offset + self.limit if self.limit else None,
+        )
+
+    def run_count(self):
+        # Every available block is in the results, whether it's used or not,
+        # so counting doesn't need to audit any pages
+        count = sum(
+            len(blocks)
+            for page_model in self.get_filtered_page_models()
+            for blocks in self.get_available_blocks(page_model).values()
+        )
+        count = max(count - self.offset, 0)
+        return min(count, self.limit) if self.limit is not None else count
@@ -1,72 +1,373 @@
+import html
 import itertools
+import json
 import logging
+import operator
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import reduce
+from hashlib import blake2b
 
 from django.core.exceptions import FieldError
-
-from wagtail.blocks import BoundBlock, StreamValue, StructValue
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from wagtail.blocks import (
+    BoundBlock,
+    ListBlock,
+    RichTextBlock,
+    StreamBlock,
+    StreamValue,
+    StructBlock,
+    StructValue,
+)
 from wagtail.blocks.list_block import ListValue
-from wagtail.contrib.typed_table_block.blocks import TypedTable
+from wagtail.contrib.typed_table_block.blocks import (
+    TypedTable,
+    TypedTableBlock,
+)
+from wagtail.fields import StreamField
 from wagtail.models import Page, Site, get_page_models
+from wagtail.rich_text import RichText
 
 from queryish import Queryish
 
-from wagtail_content_audit.utils import dotted_name
+from wagtail_content_audit.models import (
+    PageSearchCheckpoint,
+    PageSearchCheckpointResult,
+)
+from wagtail_content_audit.stats import AuditStats
+from wagtail_content_audit.utils import (
+    PageURLs,
+    SiteRootPaths,
+    dotted_name,
+    get_filter_value,
+    walk_raw_blocks,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+# The ways rich text in StreamFields can be converted to text to search
+TEXT_MODES = ("rendered", "source", "plain")
+
+
+@dataclass(frozen=True, slots=True)
 class PageMatch:
     page_model: type
-    page: Page
+    page_id: int
     field_name: str
     field_type: str
-    stream_field_path: list
+    stream_field_path: tuple
     block_type: type
-    result_path: list
-    matches: list
+    result_path: tuple
+    matches: tuple
+    site: Site = None
+    patterns: tuple = ()
+    url: str = None
+    page_title: str = None
+    page_cache: dict = field(default=None, compare=False, repr=False)
+
+    @property
+    def page(self):
+        """The page that matched, looked up by its ID the first time it is
+        used and then shared with the other matches of the same query"""
+        if self.page_cache is None:
+            return self.page_model.objects.get(pk=self.page_id)
+        page = self.page_cache.get(self.page_id)
+        if page is None:
+            page = self.page_model.objects.get(pk=self.page_id)
+            self.page_cache[self.page_id] = page
+        return page
+
+
+def get_required_substring(pattern):
+    """Return the longest run of literal characters that every match of a
+    compiled regular expression must contain, or None
+
+    This relies on the undocumented re._parser and re._constants modules
+    that have shipped with every Python version this package supports. If
+    they move or change, patterns just aren't prefiltered."""
+    if pattern.flags & re.IGNORECASE:
+        return None
+
+    try:
+        literal = re._constants.LITERAL
+        parsed = re._parser.parse(pattern.pattern, pattern.flags)
+    except (AttributeError, re.error):
+        return None
+
+    # Only literals at the top level of the pattern are required; anything
+    # inside a group, repeat, or alternation may not be part of a match
+    literal_runs = [[]]
+    for opcode, argument in parsed:
+        if opcode == literal:
+            literal_runs[-1].append(chr(argument))
+        elif len(literal_runs[-1]) > 0:
+            literal_runs.append([])
+
+    required_substring = "".join(max(literal_runs, key=len))
+    return required_substring if required_substring != "" else None
+
+
+class LeafText:
+    """Convert StreamField leaf values to the text to search
+
+    Rich text can be searched as its stored source HTML ("source"), as the
+    HTML it renders to with links and embeds expanded ("rendered", which is
+    what str() returns), or as plain text without any markup ("plain").
+    Converted rich text is cached by a hash of its source, so rich text that
+    is repeated across pages is only converted once per query."""
+
+    def __init__(self, text_mode="rendered"):
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"Unknown text mode: {text_mode}")
+        self.text_mode = text_mode
+        self.rich_text_cache = {}
+
+    def __call__(self, value):
+        if not isinstance(value, RichText):
+            return str(value)
+        if self.text_mode == "source":
+            return value.source
+
+        cache_key = blake2b(value.source.encode(), digest_size=16).digest()
+        text = self.rich_text_cache.get(cache_key)
+        if text is None:
+            if self.text_mode == "plain":
+                # The text is the same whether or not links are expanded
+                text = html.unescape(strip_tags(value.source))
+            else:
+                text = str(value)
+            self.rich_text_cache[cache_key] = text
+        return text
+
+
+def combine_patterns(patterns):
+    """Combine compiled regular expressions into a single pattern that
+    matches wherever any of them does, to test text for all of them in one
+    pass
+
+    Returns None if the patterns can't be combined without changing what
+    they match: groups would be renumbered, breaking backreferences, and
+    inline flags apply to the whole expression."""
+    if any(
+        pattern.groups > 0 or pattern.flags != re.UNICODE
+        for pattern in patterns
+    ):
+        return None
+    return re.compile(
+        "|".join(f"(?:{pattern.pattern})" for pattern in patterns)
+    )
 
 
-def search_blocks(pattern, value, path=None):
+@dataclass
+class SearchPlan:
+    """A search pattern compiled once per query, with a substring that must
+    appear in any text the pattern matches, so that text without it can be
+    skipped before running the regular expression, and the conversion of
+    leaf values to text
+
+    When searching for more than one pattern, each is compiled and run
+    separately, so that their matches are the same as searching for each
+    on its own. Text is skipped if it contains none of their required
+    substrings, or if pattern, which combines them where they can be, finds
+    no match in it."""
+
+    pattern: re.Pattern
+    required_substring: str = None
+    leaf_text: LeafText = field(default_factory=LeafText)
+    patterns: tuple = ()
+    required_substrings: tuple = ()
+    compiled_patterns: tuple = ()
+
+    @classmethod
+    def from_pattern(cls, pattern, text_mode="rendered"):
+        required_substring = get_required_substring(pattern)
+        return cls(
+            pattern=pattern,
+            required_substring=required_substring,
+            leaf_text=LeafText(text_mode),
+            patterns=(pattern.pattern,),
+            required_substrings=(required_substring,),
+            compiled_patterns=(pattern,),
+        )
+
+    @classmethod
+    def from_patterns(cls, patterns, text_mode="rendered"):
+        patterns = tuple(patterns)
+        if len(patterns) == 1:
+            return cls.from_pattern(
+                re.compile(patterns[0]), text_mode=text_mode
+            )
+
+        compiled_patterns = tuple(re.compile(pattern) for pattern in patterns)
+        return cls(
+            pattern=combine_patterns(compiled_patterns),
+            leaf_text=LeafText(text_mode),
+            patterns=patterns,
+            required_substrings=tuple(
+                get_required_substring(pattern)
+                for pattern in compiled_patterns
+            ),
+            compiled_patterns=compiled_patterns,
+        )
+
+    @property
+    def database_patterns(self):
+        """The patterns to match in the database, each matched separately"""
+        return self.patterns
+
+    def may_match(self, text):
+        if None in self.required_substrings:
+            return True
+        return any(substring in text for substring in self.required_substrings)
+
+    def search(self, text):
+        """Return the matches of the search in text, and the patterns that
+        matched, in the order they were given"""
+        if not self.may_match(text):
+            return [], []
+
+        if len(self.compiled_patterns) > 1 and (
+            self.pattern is not None and self.pattern.search(text) is None
+        ):
+            return [], []
+
+        matches = []
+        matched_patterns = []
+        for pattern, required_substring in zip(
+            self.compiled_patterns, self.required_substrings, strict=True
+        ):
+            if required_substring is not None and (
+                required_substring not in text
+            ):
+                continue
+            pattern_matches = pattern.findall(text)
+            if len(pattern_matches) > 0:
+                matches.extend(pattern_matches)
+                matched_patterns.append(pattern.pattern)
+        return matches, matched_patterns
+
+    def findall(self, text):
+        return self.search(text)[0]
+
+
+def extract_leaf_text(value, path=None, leaf_text=str):
+    """Walk a StreamField value and yield the path and text of each leaf
+
+    leaf_text(value) returns the text of each leaf value, such as a
+    LeafText."""
     if path is None:
         path = []
 
     if isinstance(value, BoundBlock):
         local_path = path + [value.block]
-        yield from search_blocks(pattern, value.value, path=local_path)
+        yield from extract_leaf_text(
+            value.value, path=local_path, leaf_text=leaf_text
+        )
 
     elif isinstance(value, StructValue):
         local_path = path
         for child in value.bound_blocks.values():
-            yield from search_blocks(pattern, child, path=path)
+            yield from extract_leaf_text(child, path=path, leaf_text=leaf_text)
 
     elif isinstance(value, ListValue):
         for index, child in enumerate(value.bound_blocks):
             local_path = path + ["item", index]
-            yield from search_blocks(pattern, child, path=local_path)
+            yield from extract_leaf_text(
+                child, path=local_path, leaf_text=leaf_text
+            )
 
     elif isinstance(value, StreamValue):
         for index, child in enumerate(value):
             local_path = path + [index]
-            yield from search_blocks(pattern, child, path=local_path)
+            yield from extract_leaf_text(
+                child, path=local_path, leaf_text=leaf_text
+            )
 
     elif isinstance(value, TypedTable):
         for row_index, row in enumerate(value.rows):
             local_path = path + [row_index]
             for column_index, child in enumerate(row):
                 local_path = local_path + [column_index]
-                yield from search_blocks(pattern, child, path=local_path)
+                yield from extract_leaf_text(
+                    child, path=local_path, leaf_text=leaf_text
+                )
 
     else:
-        matches = pattern.findall(str(value))
+        yield path, leaf_text(value)
+
+
+def extract_raw_leaf_text(block, value, path=None, leaf_text=str):
+    """Walk a StreamField's raw JSON against its block definitions and yield
+    the path and text of each leaf, with the same paths as
+    extract_leaf_text()
+
+    Leaves are the values stored in the JSON, for example the IDs of chosen
+    pages, rather than the values blocks convert them to, except that rich
+    text is passed to leaf_text() as RichText."""
+    if path is None:
+        path = []
+
+    for child_block, child_value, child_path in walk_raw_blocks(
+        block, value, path, get_raw_leaf_path
+    ):
+        if isinstance(
+            child_block, (StreamBlock, StructBlock, ListBlock, TypedTableBlock)
+        ):
+            continue
+        if isinstance(child_block, RichTextBlock):
+            yield child_path, leaf_text(RichText(child_value))
+        else:
+            yield child_path, leaf_text(child_value)
+
+
+def get_raw_leaf_path(parent, block, position):
+    """Return the path of a block in raw stream JSON, in the form
+    extract_leaf_text() gives paths"""
+    return [*parent, *position, block]
+
+
+def search_blocks(pattern, value, path=None):
+    for leaf_path, text in extract_leaf_text(value, path=path):
+        matches = pattern.findall(text)
         if len(matches) > 0:
-            yield path, matches
+            yield leaf_path, matches
+
+
+def format_streamfield_path(streamfield_path):
+    """Construct a specific path (with list indexes) from a path of blocks
+    and indexes, following the conventions of Wagtail's StreamField
+    migration pathing"""
+    return [
+        ((p.name if hasattr(p, "name") else p) if p is not None else "item")
+        for p in streamfield_path
+    ]
+
+
+def format_leaves(leaves):
+    """Yield the formatted path, block type, and text of each leaf from
+    extract_leaf_text() or extract_raw_leaf_text()"""
+    for streamfield_path, text in leaves:
+        yield (
+            format_streamfield_path(streamfield_path),
+            dotted_name(streamfield_path[-1].__class__),
+            text,
+        )
 
 
 class PageSearchQuerySet(Queryish):
+    # The AuditStats of the last query run with stats=True
+    stats = None
+
+    # The pages of the last query's matches that have been used, by ID
+    page_cache = None
+
     def get_filtered_page_models(self):
         global_page_models = get_page_models()
         filters = [val for key, val in self.filters if key == "page_model"]
@@ -85,112 +386,594 @@ class PageSearchQuerySet(Queryish):
         ]
         return filtered_fields if len(filters) > 0 else all_fields
 
-    def get_search_re(self):
-        search_str = next(
-            (val for key, val in self.filters if key == "search"), ""
+    def get_search_patterns(self):
+        """Return the search patterns, which can be given as a list or by
+        filtering for search more than once"""
+        search_patterns = []
+        for key, val in self.filters:
+            if key != "search":
+                continue
+            if isinstance(val, (list, tuple)):
+                search_patterns.extend(val)
+            else:
+                search_patterns.append(val)
+        return search_patterns if len(search_patterns) > 0 else [""]
+
+    def get_chunk_size(self):
+        return get_filter_value(self.filters, "chunk_size", 2000)
+
+    def get_drafts(self):
+        return get_filter_value(self.filters, "drafts", False)
+
+    def get_all_sites(self):
+        return get_filter_value(self.filters, "all_sites", False)
+
+    def get_sites(self):
+        """Return every Site, to find the site of each page, and the sites
+        whose pages should be searched"""
+        sites = list(Site.objects.select_related("root_page"))
+        if self.get_all_sites():
+            return sites, sites
+
+        default_sites = [site for site in sites if site.is_default_site]
+        if len(default_sites) == 0:
+            raise Site.DoesNotExist("There is no default site.")
+        return sites, default_sites
+
+    def get_since(self):
+        return get_filter_value(self.filters, "since")
+
+    def get_checkpoint_name(self):
+        return get_filter_value(self.filters, "checkpoint")
+
+    def get_changed_since_filter(self, since, prefix=""):
+        """Return a filter for pages changed since a time: published, or
+        with a new revision when searching drafts"""
+        if self.get_drafts():
+            lookup = f"{prefix}latest_revision_created_at__gt"
+        else:
+            lookup = f"{prefix}last_published_at__gt"
+        return Q(**{lookup: since})
+
+    def get_urls(self):
+        return get_filter_value(self.filters, "urls", False)
+
+    def get_text_mode(self):
+        return get_filter_value(self.filters, "text_mode", "rendered")
+
+    def get_search_plan(self):
+        search_plan = SearchPlan.from_patterns(
+            self.get_search_patterns(), text_mode=self.get_text_mode()
         )
-        search_re = re.compile(search_str)
-        return search_re
+        if self.stats is not None:
+            search_plan.search = self.stats.timed_regex(search_plan.search)
+        return search_plan
+
+    def get_stats(self):
+        return get_filter_value(self.filters, "stats", False)
 
     def prepare_pattern_for_json(self, pattern):
         return pattern.replace('"', r'\\"')
 
-    def get_matches_for_page_field(self, page_model, field_name, page):
-        search_re = self.get_search_re()
-        field = page_model._meta.get_field(field_name)
-        field_type = dotted_name(field.__class__)
-        field_value = getattr(page, field_name)
-
-        page_match = PageMatch(
-            page_model=page_model,
-            page=page,
-            field_name=field_name,
-            field_type=field_type,
-            stream_field_path=[],
-            block_type=None,
-            result_path=[],
-            matches=[],
+    def get_streamfield_leaves(self, streamfield_value, leaf_text=str):
+        """Return the formatted path, block type, and text of each leaf in a
+        StreamField value
+
+        Leaves aren't kept in the traversal cache, because their text
+        depends on more than the StreamField's stored JSON: links in rich
+        text are expanded to the current URLs of the pages and documents
+        they link to, and chosen objects are converted to their current
+        titles."""
+        return format_leaves(
+            extract_leaf_text(streamfield_value, leaf_text=leaf_text)
         )
 
-        if isinstance(field_value, StreamValue):
+    def get_matches_in_field(
+        self,
+        page_model,
+        field,
+        page,
+        field_value,
+        leaves,
+        search_plan,
+        site,
+        url=None,
+        page_title=None,
+    ):
+        """Yield a PageMatch for each leaf of a StreamField that matches the
+        search, given as (formatted path, block type, text) tuples, or for
+        the value of any other field when leaves is None, with the page's
+        title unless another page_title is given
+
+        Each PageMatch is a new, immutable object, so results can be kept
+        without copying them. Matches only keep the page's ID and title, so
+        the page and its StreamField values can be freed once its fields
+        have been searched."""
+        field_match = {
+            "page_model": page_model,
+            "page_id": page.pk,
+            "field_name": field.name,
+            "field_type": dotted_name(field.__class__),
+            "site": site,
+            "url": url,
+            "page_title": page_title if page_title is not None else page.title,
+            "page_cache": self.page_cache,
+        }
+
+        if leaves is not None and self.stats is not None:
+            leaves = self.stats.counted_blocks(leaves)
+
+        if leaves is not None:
             # If this field is a StreamField, dive into it to get paths
             # and matches
-            for streamfield_path, matches in search_blocks(
-                search_re, field_value
-            ):
-                # Construct a specific path (with list indexes) and then a
-                # general path that follow the conventions of Wagtail's
-                # StreamField migration pathing.
-                formatted_path = [
-                    (
-                        (p.name if hasattr(p, "name") else p)
-                        if p is not None
-                        else "item"
-                    )
-                    for p in streamfield_path
-                ]
-                page_match.block_type = dotted_name(
-                    streamfield_path[-1].__class__
+            for formatted_path, block_type, text in leaves:
+                matches, patterns = search_plan.search(text)
+                if len(matches) == 0:
+                    continue
+
+                # Use the specific path and then a general path without list
+                # indexes
+                yield PageMatch(
+                    **field_match,
+                    stream_field_path=tuple(
+                        p for p in formatted_path if not isinstance(p, int)
+                    ),
+                    block_type=block_type,
+                    result_path=tuple(str(p) for p in formatted_path),
+                    matches=tuple(matches),
+                    patterns=tuple(patterns),
                 )
-                page_match.result_path = [str(p) for p in formatted_path]
-                page_match.stream_field_path = [
-                    p for p in formatted_path if not isinstance(p, int)
-                ]
-                page_match.matches = matches
-                yield page_match
 
         else:
-            matches = search_re.findall(str(field_value))
-            page_match.matches = matches
-            yield page_match
+            matches, patterns = search_plan.search(str(field_value))
+            yield PageMatch(
+                **field_match,
+                stream_field_path=(),
+                block_type=None,
+                result_path=(),
+                matches=tuple(matches),
+                patterns=tuple(patterns),
+            )
+
+    def get_matches_for_page_field(
+        self,
+        page_model,
+        field_name,
+        page,
+        search_plan=None,
+        site=None,
+        url=None,
+    ):
+        if search_plan is None:
+            search_plan = self.get_search_plan()
 
-    def get_matches_for_page_model_field(self, page_model, field_name):
-        search_re = self.get_search_re()
+        field = page_model._meta.get_field(field_name)
+        field_value = getattr(page, field_name)
 
-        # Get the default site
-        site = Site.objects.get(is_default_site=True)
+        leaves = None
+        if isinstance(field_value, StreamValue):
+            leaves = self.get_streamfield_leaves(
+                field_value, leaf_text=search_plan.leaf_text
+            )
 
-        # Search for live pages in the default site
-        queryset = page_model.objects.live().in_site(site)
+        yield from self.get_matches_in_field(
+            page_model,
+            field,
+            page,
+            field_value,
+            leaves,
+            search_plan,
+            site,
+            url=url,
+        )
+
+    def get_matches_for_draft_field(
+        self,
+        page_model,
+        field_name,
+        page,
+        field_value,
+        search_plan=None,
+        site=None,
+        url=None,
+    ):
+        """Search the value of a field in a page's latest revision, as the
+        JSON stored in the revision's content"""
+        if search_plan is None:
+            search_plan = self.get_search_plan()
+
+        field = page_model._meta.get_field(field_name)
+
+        leaves = None
+        if isinstance(field, StreamField):
+            # Revision content holds StreamFields as JSON strings, which some
+            # databases return encoded as JSON again
+            while isinstance(field_value, str):
+                if self.stats is not None:
+                    self.stats.count_json_bytes(field_value)
+                field_value = json.loads(field_value)
+            leaves = format_leaves(
+                extract_raw_leaf_text(
+                    field.stream_block,
+                    field_value,
+                    leaf_text=search_plan.leaf_text,
+                )
+            )
+
+        yield from self.get_matches_in_field(
+            page_model,
+            field,
+            page,
+            field_value,
+            leaves,
+            search_plan,
+            site,
+            url=url,
+            # The title of the page's latest revision
+            page_title=page.draft_title,
+        )
+
+    def get_matches_for_page_model(
+        self,
+        page_model,
+        field_names,
+        search_plan=None,
+        sites=None,
+        page_urls=None,
+    ):
+        if search_plan is None:
+            search_plan = self.get_search_plan()
+
+        if page_urls is None and self.get_urls():
+            page_urls = PageURLs()
+
+        # Get the sites to search, and every site to find each page's site
+        if sites is None:
+            sites = self.get_sites()
+        all_sites, search_sites = sites
+        site_root_paths = SiteRootPaths(all_sites)
+
+        drafts = self.get_drafts()
+        if drafts:
+            # Search the latest revision of pages in the sites, live or not,
+            # without loading the page model's own copies of its fields
+            queryset = page_model.objects.filter(
+                latest_revision__isnull=False
+            ).defer(
+                *(
+                    field.name
+                    for field in page_model._meta.concrete_fields
+                    if field.model is not Page and not field.primary_key
+                )
+            )
+        else:
+            # Search for live pages in the sites
+            queryset = page_model.objects.live()
+
+        since = self.get_since()
+        if since is not None:
+            queryset = queryset.filter(self.get_changed_since_filter(since))
+
+        queryset = queryset.filter(
+            reduce(
+                operator.or_,
+                (
+                    Q(path__startswith=site.root_page.path)
+                    for site in search_sites
+                ),
+                Q(pk__in=[]),
+            )
+        )
 
         # Try to do in-database regular expression-matching of the search
-        # string.
-        try:
-            queryset = queryset.filter(
+        # string, annotating each page with whether each field matched, so
+        # that each page is only loaded once however many fields match.
+        # Patterns are matched separately, since joining them would
+        # renumber their groups.
+        db_patterns = [
+            self.prepare_pattern_for_json(pattern)
+            for pattern in search_plan.database_patterns
+        ]
+
+        def get_field_match(lookup):
+            return reduce(
+                operator.or_,
+                (
+                    Q(**{f"{lookup}__iregex": db_pattern})
+                    for db_pattern in db_patterns
+                ),
+            )
+
+        field_annotations = {}
+        for field_name in field_names:
+            field_match = get_field_match(field_name)
+            try:
+                queryset.filter(field_match)
+            except FieldError:
+                logger.info(
+                    f"Cannot search {dotted_name(page_model)}.{field_name}."
+                )
+                continue
+
+            annotation = f"search_match_{len(field_annotations)}"
+            field_annotations[field_name] = annotation
+
+            if drafts:
+                # Match and fetch the field's value in the latest revision's
+                # content, rather than the page's
+                field_match = get_field_match(
+                    f"latest_revision__content__{field_name}"
+                )
+                queryset = queryset.annotate(
+                    **{
+                        f"{annotation}_draft": KeyTransform(
+                            field_name, "latest_revision__content"
+                        )
+                    }
+                )
+
+            queryset = queryset.annotate(
                 **{
-                    f"{field_name}__iregex": self.prepare_pattern_for_json(
-                        search_re.pattern
+                    annotation: ExpressionWrapper(
+                        field_match, output_field=BooleanField()
                     )
                 }
             )
-        except FieldError:
-            logger.info(
-                f"Cannot search {dotted_name(page_model)}.{field_name}."
-            )
+
+        if len(field_annotations) == 0:
             return
 
+        queryset = queryset.filter(
+            reduce(
+                operator.or_,
+                (
+                    Q(**{annotation: True})
+                    for annotation in field_annotations.values()
+                ),
+            )
+        )
+
+        # Stream pages, so that a sliced query stops loading pages once it
+        # has enough results
         queryset = queryset.exact_type(page_model)
-        for page in queryset:
-            yield from self.get_matches_for_page_field(
-                page_model, field_name, page
+        pages = queryset.iterator(chunk_size=self.get_chunk_size())
+
+        for page in pages:
+            if self.stats is not None:
+                self.stats.pages_scanned += 1
+
+            site = site_root_paths.get_site(page.path)
+            url = page_urls.get_url(page) if page_urls is not None else None
+            for field_name, annotation in field_annotations.items():
+                if not getattr(page, annotation):
+                    continue
+
+                if drafts:
+                    field_matches = self.get_matches_for_draft_field(
+                        page_model,
+                        field_name,
+                        page,
+                        getattr(page, f"{annotation}_draft"),
+                        search_plan=search_plan,
+                        site=site,
+                        url=url,
+                    )
+                else:
+                    field_matches = self.get_matches_for_page_field(
+                        page_model,
+                        field_name,
+                        page,
+                        search_plan=search_plan,
+                        site=site,
+                        url=url,
+                    )
+
+                if self.stats is not None:
+                    field_matches = self.stats.timed(
+                        field_matches,
+                        self.stats.field_times,
+                        f"{dotted_name(page_model)}.{field_name}",
+                    )
+                yield from field_matches
+
+    def get_matches_for_page_model_field(
+        self, page_model, field_name, search_plan=None
+    ):
+        yield from self.get_matches_for_page_model(
+            page_model, [field_name], search_plan=search_plan
+        )
+
+    def search(self):
+        """Yield a PageMatch for each match of the search"""
+        # Compile the search pattern once for the whole query
+        search_plan = self.get_search_plan()
+
+        # Get the sites once for the whole query
+        sites = self.get_sites()
+
+        # Resolve page URLs with the site root paths looked up once
+        page_urls = PageURLs() if self.get_urls() else None
+
+        # Each page model is a unit of work that is only started once the
+        # results of the previous one have been consumed
+        return itertools.chain.from_iterable(
+            self.get_page_model_matches(
+                page_model, search_plan, sites, page_urls
             )
+            for page_model in self.get_filtered_page_models()
+        )
 
-    def run_query(self):
-        search_matches = []
-
-        for page_model in self.get_filtered_page_models():
-            for field_name in self.get_filtered_field_names(page_model):
-                search_matches = itertools.chain(
-                    search_matches,
-                    self.get_matches_for_page_model_field(
-                        page_model, field_name
-                    ),
+    def get_page_model_matches(
+        self, page_model, search_plan, sites, page_urls
+    ):
+        page_model_matches = self.get_matches_for_page_model(
+            page_model,
+            self.get_filtered_field_names(page_model),
+            search_plan=search_plan,
+            sites=sites,
+            page_urls=page_urls,
+        )
+        if self.stats is not None:
+            page_model_matches = self.stats.timed(
+                page_model_matches,
+                self.stats.page_model_times,
+                dotted_name(page_model),
+            )
+        return page_model_matches
+
+    def get_search_definition(self):
+        """Return the options that determine a search's results, to tell
+        whether a checkpoint's results are for the same search"""
+        return {
+            "search": self.get_search_patterns(),
+            "page_models": sorted(
+                dotted_name(page_model)
+                for page_model in self.get_filtered_page_models()
+            ),
+            "fields": sorted(
+                val for key, val in self.filters if key == "field"
+            ),
+            "all_sites": self.get_all_sites(),
+            "drafts": self.get_drafts(),
+            "text_mode": self.get_text_mode(),
+        }
+
+    def update_checkpoint(self, name):
+        """Search the pages changed since a checkpoint's watermark, replace
+        the checkpoint's results for those pages, and return the checkpoint
+
+        If the search has changed since the checkpoint was last updated, all
+        pages are searched again."""
+        if self.get_since() is not None:
+            # The checkpoint's watermark decides which pages are searched
+            raise ValueError("Checkpointed searches can't use since.")
+
+        search_definition = self.get_search_definition()
+
+        with transaction.atomic():
+            checkpoint, _ = (
+                PageSearchCheckpoint.objects.select_for_update().get_or_create(
+                    name=name
                 )
+            )
+            if checkpoint.search != search_definition:
+                checkpoint.results.all().delete()
+                checkpoint.search = search_definition
+                checkpoint.watermark = None
+
+            # Take the new watermark before searching, so that pages changed
+            # during the search are searched again next time
+            watermark = timezone.now()
+
+            search_qs = self
+            if checkpoint.watermark is not None:
+                # Results for changed pages are replaced, whether or not the
+                # pages still match
+                search_qs = search_qs.filter(since=checkpoint.watermark)
+                checkpoint.results.filter(
+                    self.get_changed_since_filter(
+                        checkpoint.watermark, prefix="page__"
+                    )
+                ).delete()
+            if not self.get_drafts():
+                checkpoint.results.filter(page__live=False).delete()
+
+            results = (
+                PageSearchCheckpointResult(
+                    checkpoint=checkpoint,
+                    page_id=page_match.page_id,
+                    site=page_match.site,
+                    field_name=page_match.field_name,
+                    field_type=page_match.field_type,
+                    stream_field_path=list(page_match.stream_field_path),
+                    block_type=page_match.block_type,
+                    result_path=list(page_match.result_path),
+                    matches=list(page_match.matches),
+                    patterns=list(page_match.patterns),
+                )
+                for page_match in search_qs.search()
+            )
+            while batch := list(
+                itertools.islice(results, self.get_chunk_size())
+            ):
+                PageSearchCheckpointResult.objects.bulk_create(batch)
+
+            checkpoint.watermark = watermark
+            checkpoint.save()
+
+        return checkpoint
 
-        # Slice based on queryset slicing offset/limit
-        return itertools.islice(
+    def get_checkpoint_matches(self, checkpoint):
+        """Yield a PageMatch for each of a checkpoint's results"""
+        page_urls = PageURLs() if self.get_urls() else None
+        drafts = self.get_drafts()
+        results = (
+            checkpoint.results.select_related("page", "site")
+            .order_by("page__path", "pk")
+            .iterator(chunk_size=self.get_chunk_size())
+        )
+        for result in results:
+            yield PageMatch(
+                page_model=result.page.specific_class or Page,
+                page_id=result.page_id,
+                field_name=result.field_name,
+                field_type=result.field_type,
+                stream_field_path=tuple(result.stream_field_path),
+                block_type=result.block_type,
+                result_path=tuple(result.result_path),
+                # Matches of patterns with groups are tuples
+                matches=tuple(
+                    tuple(match) if isinstance(match, list) else match
+                    for match in result.matches
+                ),
+                site=result.site,
+                patterns=tuple(result.patterns),
+                url=(
+                    page_urls.get_url(result.page)
+                    if page_urls is not None
+                    else None
+                ),
+                page_title=(
+                    result.page.draft_title if drafts else result.page.title
+                ),
+                page_cache=self.page_cache,
+            )
+
+    def run_query(self):
+        self.page_cache = {}
+        if self.get_stats():
+            self.stats = AuditStats()
+            return self.stats.measure_query(self, self.run_search_query())
+        return self.run_search_query()
+
+    def run_search_query(self):
+        checkpoint_name = self.get_checkpoint_name()
+        if checkpoint_name is not None:
+            # The checkpoint is brought up to date before any of its results
+            # are returned
+            checkpoint = self.update_checkpoint(checkpoint_name)
+            search_matches = self.get_checkpoint_matches(checkpoint)
+        else:
+            search_matches = self.search()
+
+        # Slice based on queryset slicing offset/limit, which stops searching
+        # once enough matches have been found
+        yield from itertools.islice(
             search_matches,
             self.offset,
             self.offset + self.limit if self.limit else None,
-            self.limit,
         )
+
+    def run_count(self):
+        checkpoint_name = self.get_checkpoint_name()
+        if checkpoint_name is not None:
+            # Counting doesn't bring the checkpoint up to date, so count the
+            # results it keeps
+            count = PageSearchCheckpointResult.objects.filter(
+                checkpoint__name=checkpoint_name
+            ).count()
+            count = max(count - self.offset, 0)
+            return min(count, self.limit) if self.limit else count
+
+        # Count matches as they are found, without keeping them
+        return sum(1 for page_match in self.run_query())
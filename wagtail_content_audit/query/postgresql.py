@@ -0,0 +1,171 @@
+from django.db import connections
+from django.db.models import IntegerField, Value
+
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.contrib.typed_table_block.blocks import TypedTableBlock
+
+
+# Walk a StreamField's JSON in a recursive CTE, following the block
+# definitions passed in as a VALUES list, and aggregate the occurrences of
+# each block path. Each step of the recursion expands one node according to
+# the kind of block it holds, mirroring walk_raw_blocks().
+BLOCK_USAGE_SQL = """
+WITH RECURSIVE
+definitions (parent, name, path, kind) AS (
+    VALUES {definitions}
+),
+pages (page_id, live, in_default_site, site_id, data) AS (
+    SELECT
+        page.page_id,
+        page.live,
+        page.path LIKE %s,
+        page.site_id,
+        page.data::jsonb
+    FROM ({pages}) AS page (page_id, live, path, site_id, data)
+),
+nodes (page_id, path, kind, data) AS (
+    SELECT page_id, '', 'stream', data FROM pages
+    UNION ALL
+    SELECT nodes.page_id, children.path, children.kind, children.data
+    FROM nodes
+    CROSS JOIN LATERAL (
+        SELECT definitions.path, definitions.kind, item.data -> 'value'
+        FROM jsonb_array_elements(
+            CASE WHEN nodes.kind = 'stream'
+                AND jsonb_typeof(nodes.data) = 'array'
+            THEN nodes.data ELSE '[]'::jsonb END
+        ) AS item (data)
+        JOIN definitions
+            ON definitions.parent = nodes.path
+            AND definitions.name = item.data ->> 'type'
+
+        UNION ALL
+
+        SELECT definitions.path, definitions.kind,
+            nodes.data -> definitions.name
+        FROM definitions
+        WHERE nodes.kind = 'struct' AND definitions.parent = nodes.path
+
+        UNION ALL
+
+        SELECT definitions.path, definitions.kind,
+            CASE WHEN jsonb_typeof(item.data) = 'object'
+                AND item.data ? 'id'
+                AND item.data ? 'value'
+                AND item.data ->> 'type' = 'item'
+            THEN item.data -> 'value' ELSE item.data END
+        FROM jsonb_array_elements(
+            CASE WHEN nodes.kind = 'list'
+                AND jsonb_typeof(nodes.data) = 'array'
+            THEN nodes.data ELSE '[]'::jsonb END
+        ) AS item (data)
+        JOIN definitions ON definitions.parent = nodes.path
+
+        UNION ALL
+
+        SELECT definitions.path, definitions.kind,
+            table_row.data -> 'values' -> (table_column.ordinal::int - 1)
+        FROM jsonb_array_elements(
+            CASE WHEN nodes.kind = 'table'
+                AND jsonb_typeof(nodes.data -> 'columns') = 'array'
+            THEN nodes.data -> 'columns' ELSE '[]'::jsonb END
+        ) WITH ORDINALITY AS table_column (data, ordinal)
+        CROSS JOIN jsonb_array_elements(
+            CASE WHEN nodes.kind = 'table'
+                AND jsonb_typeof(nodes.data -> 'rows') = 'array'
+            THEN nodes.data -> 'rows' ELSE '[]'::jsonb END
+        ) AS table_row (data)
+        JOIN definitions
+            ON definitions.parent = nodes.path
+            AND definitions.name = table_column.data ->> 'type'
+    ) AS children (path, kind, data)
+)
+SELECT
+    page_nodes.path,
+    SUM(page_nodes.occurrences)::bigint,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE pages.live),
+    COUNT(*) FILTER (WHERE pages.in_default_site),
+    ARRAY_AGG(pages.page_id ORDER BY pages.page_id),
+    ARRAY_AGG(pages.site_id ORDER BY pages.page_id)
+FROM (
+    SELECT nodes.path, nodes.page_id, COUNT(*) AS occurrences
+    FROM nodes
+    WHERE nodes.path <> ''
+    GROUP BY nodes.path, nodes.page_id
+) AS page_nodes
+JOIN pages ON pages.page_id = page_nodes.page_id
+GROUP BY page_nodes.path
+"""
+
+
+def get_block_kind(block):
+    if isinstance(block, StreamBlock):
+        return "stream"
+    elif isinstance(block, StructBlock):
+        return "struct"
+    elif isinstance(block, ListBlock):
+        return "list"
+    elif isinstance(block, TypedTableBlock):
+        return "table"
+    return "leaf"
+
+
+def get_block_definitions(block, parent=""):
+    """Yield (parent path, name, path, kind) for each child block, following
+    the same path conventions as traverse_streamblock()"""
+    if isinstance(block, ListBlock):
+        child_blocks = {"item": block.child_block}
+    elif isinstance(block, (StreamBlock, StructBlock, TypedTableBlock)):
+        child_blocks = block.child_blocks
+    else:
+        child_blocks = {}
+
+    for child_name, child_block in child_blocks.items():
+        block_name = child_block.name if child_block.name != "" else "item"
+        path = parent + "." + block_name if parent != "" else block_name
+        yield parent, child_name, path, get_block_kind(child_block)
+        yield from get_block_definitions(child_block, parent=path)
+
+
+def audit_blocks_in_database(page_queryset, streamfield, root_path):
+    """Aggregate block usage for a StreamField in PostgreSQL
+
+    Returns a dictionary of block path to a tuple of total occurrences,
+    pages count, live pages count, count of pages in the default site, the
+    list of page IDs, and the list of the site ID of each of those pages.
+    StructBlock children missing from the stored JSON are counted, but not
+    the children of their default values.
+
+    The page queryset may be annotated with a site_id for each page,
+    otherwise the site IDs are all None."""
+    definitions = list(get_block_definitions(streamfield.stream_block))
+    if len(definitions) == 0:
+        return {}
+
+    if "site_id" not in page_queryset.query.annotations:
+        page_queryset = page_queryset.annotate(
+            site_id=Value(None, output_field=IntegerField())
+        )
+
+    pages_sql, pages_params = (
+        page_queryset.values_list(
+            "pk", "live", "path", "site_id", streamfield.name
+        )
+        .order_by()
+        .query.sql_with_params()
+    )
+    sql = BLOCK_USAGE_SQL.format(
+        definitions=", ".join(["(%s, %s, %s, %s)"] * len(definitions)),
+        pages=pages_sql,
+    )
+    params = [
+        *(value for definition in definitions for value in definition),
+        # Descendants of the root page have longer paths that start with it
+        root_path + "_%",
+        *pages_params,
+    ]
+
+    with connections[page_queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0]: row[1:] for row in cursor.fetchall()}
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_save
+
+from wagtail.models import Page
+
+from wagtail_content_audit.index import index_page
+
+
+def update_block_usage_index(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    # Skip pages loaded from fixtures, and saves that don't change any
+    # StreamFields, such as saving a revision
+    if not isinstance(instance, Page) or raw:
+        return
+    if update_fields is not None and not (
+        set(update_fields) & set(type(instance).get_streamfield_names())
+    ):
+        return
+    index_page(instance)
+
+
+def register_signal_handlers():
+    # Index the content of a page's row whenever it's saved, whether or not
+    # it's published, like the other block usage engines audit. Deleted
+    # pages are removed from the index by the cascading delete of
+    # IndexedBlockUsage.page
+    post_save.connect(
+        update_block_usage_index,
+        dispatch_uid="wagtail_content_audit_update_block_usage_index",
+    )
+
+
+def unregister_signal_handlers():
+    post_save.disconnect(
+        dispatch_uid="wagtail_content_audit_update_block_usage_index"
+    )
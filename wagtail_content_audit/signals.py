@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent when the results of an audit query run with stats=True have been
+# consumed or discarded, with the queryset and its AuditStats
+audit_query_finished = Signal()
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+
+from django.db import connections
+
+from wagtail_content_audit.signals import audit_query_finished
+
+
+@dataclass
+class AuditStats:
+    """Where an audit query spent its time
+
+    Times are in seconds, and only count time spent producing results, not
+    time the caller spends consuming them. Database queries are counted on
+    every connection, except those made in worker processes. The pages
+    scanned and field times of worker processes are added once each worker
+    finishes, so field times are the sum of every worker's."""
+
+    total_time: float = 0.0
+    query_count: int = 0
+    query_time: float = 0.0
+    page_model_times: dict = field(default_factory=lambda: defaultdict(float))
+    field_times: dict = field(default_factory=lambda: defaultdict(float))
+    pages_scanned: int = 0
+    blocks_visited: int = 0
+    json_bytes: int = 0
+    regex_time: float = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        """A database execute wrapper that counts and times queries"""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.query_time += perf_counter() - start
+
+    @contextmanager
+    def recording_queries(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(self.record_query)
+                )
+            yield
+
+    def measure_query(self, queryset, results):
+        """Yield the results of a queryset's query, timing each result and
+        recording the queries made to produce it, and send the
+        audit_query_finished signal once the results have been consumed or
+        discarded"""
+        try:
+            iterator = iter(results)
+            while True:
+                start = perf_counter()
+                with self.recording_queries():
+                    try:
+                        result = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        self.total_time += perf_counter() - start
+                yield result
+        finally:
+            audit_query_finished.send(
+                sender=type(queryset), queryset=queryset, stats=self
+            )
+
+    def timed(self, iterable, times, key):
+        """Yield from an iterable, adding the time spent producing each item
+        to times[key]"""
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                times[key] += perf_counter() - start
+            yield item
+
+    def timed_regex(self, function):
+        """Wrap a search function to add the time spent in it to
+        regex_time"""
+
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.regex_time += perf_counter() - start
+
+        return timed_function
+
+    def count_json_bytes(self, value):
+        """Add the size of a StreamField's JSON string, about to be decoded,
+        to json_bytes"""
+        self.json_bytes += len(value.encode())
+
+    def merge(self, other):
+        """Add the counts of another AuditStats, from a worker process"""
+        self.pages_scanned += other.pages_scanned
+        self.blocks_visited += other.blocks_visited
+        self.json_bytes += other.json_bytes
+        self.regex_time += other.regex_time
+        for field_name, seconds in other.field_times.items():
+            self.field_times[field_name] += seconds
+
+    def counted_blocks(self, blocks):
+        """Yield from an iterable of blocks, counting each as visited"""
+        for block in blocks:
+            self.blocks_visited += 1
+            yield block
+
+    def summary(self):
+        """Return the stats as lines of text"""
+        lines = [
+            f"Total time: {self.total_time:.3f}s",
+            f"Database queries: {self.query_count} in {self.query_time:.3f}s",
+            f"Pages scanned: {self.pages_scanned}",
+            f"Blocks visited: {self.blocks_visited}",
+            f"JSON bytes decoded: {self.json_bytes}",
+            f"Regular expression time: {self.regex_time:.3f}s",
+        ]
+        lines.extend(
+            f"Page model {page_model}: {seconds:.3f}s"
+            for page_model, seconds in self.page_model_times.items()
+        )
+        lines.extend(
+            f"Field {field_name}: {seconds:.3f}s"
+            for field_name, seconds in self.field_times.items()
+        )
+        return lines
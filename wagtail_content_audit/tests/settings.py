@@ -17,6 +17,19 @@ DATABASES = {
     },
 }
 
+# Run the tests against PostgreSQL, for the database engine's queries
+if os.environ.get("DATABASE_ENGINE") == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POSTGRES_DB", "wagtail_content_audit"),
+            "USER": os.environ.get("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD", ""),
+            "HOST": os.environ.get("POSTGRES_HOST", "localhost"),
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+        },
+    }
+
 WAGTAIL_APPS = (
     "wagtail.contrib.forms",
     "wagtail.contrib.settings",
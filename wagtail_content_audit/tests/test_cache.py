@@ -0,0 +1,185 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from wagtail_content_audit.cache import (
+    TraversalBatch,
+    get_content_hash,
+    get_streamfield_fingerprint,
+    memoize_traversal,
+)
+from wagtail_content_audit.query.blockusage import BlockUsageQuerySet
+from wagtail_content_audit.query.pagesearch import PageSearchQuerySet
+from wagtail_content_audit.tests.testapp.models import SearchTestPage
+
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "content_audit": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "content_audit",
+    },
+}
+
+
+@override_settings(
+    CACHES=TEST_CACHES, WAGTAIL_CONTENT_AUDIT_CACHE="content_audit"
+)
+class TraversalCacheTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
+    def setUp(self):
+        caches["content_audit"].clear()
+        self.test_page = SearchTestPage.objects.get(id=3)
+        self.streamfield = SearchTestPage._meta.get_field(
+            "streamfield_with_block"
+        )
+        self.stream_value = self.test_page.streamfield_with_block
+
+    def test_memoize_traversal(self):
+        traverse = mock.Mock(return_value=iter(["a", "b"]))
+        for _ in range(2):
+            results = memoize_traversal(
+                "test", self.streamfield, 3, self.stream_value, traverse
+            )
+            self.assertEqual(results, ["a", "b"])
+        traverse.assert_called_once()
+
+    def test_memoize_traversal_never_expires(self):
+        traversal_cache = caches["content_audit"]
+        with mock.patch.object(
+            traversal_cache, "set", wraps=traversal_cache.set
+        ) as cache_set:
+            memoize_traversal(
+                "test", self.streamfield, 3, self.stream_value, lambda: []
+            )
+        self.assertIsNone(cache_set.call_args.kwargs["timeout"])
+
+    def test_traversal_batch(self):
+        traverse = mock.Mock(return_value=iter(["a", "b"]))
+        values = [(self.streamfield, 3, self.stream_value)]
+
+        traversal_batch = TraversalBatch("test")
+        traversal_batch.load(values)
+        self.assertEqual(
+            traversal_batch.memoize(
+                self.streamfield, 3, self.stream_value, traverse
+            ),
+            ["a", "b"],
+        )
+        traversal_batch.save()
+
+        traversal_cache = caches["content_audit"]
+        traversal_batch = TraversalBatch("test")
+        with mock.patch.object(
+            traversal_cache, "get_many", wraps=traversal_cache.get_many
+        ) as get_many:
+            traversal_batch.load(values)
+        get_many.assert_called_once()
+        self.assertEqual(
+            traversal_batch.memoize(
+                self.streamfield, 3, self.stream_value, traverse
+            ),
+            ["a", "b"],
+        )
+        traverse.assert_called_once()
+
+    @override_settings(WAGTAIL_CONTENT_AUDIT_CACHE=None)
+    def test_traversal_batch_without_cache(self):
+        traversal_batch = TraversalBatch("test")
+        traversal_batch.load([(self.streamfield, 3, self.stream_value)])
+        traversal_batch.save()
+        traverse = mock.Mock(return_value=iter(["a", "b"]))
+        self.assertEqual(
+            list(
+                traversal_batch.memoize(
+                    self.streamfield, 3, self.stream_value, traverse
+                )
+            ),
+            ["a", "b"],
+        )
+
+    def test_traversals_are_loaded_in_batches(self):
+        traversal_cache = caches["content_audit"]
+        queryset = BlockUsageQuerySet().filter(
+            page_model=SearchTestPage, engine="raw", chunk_size=1
+        )
+        with (
+            mock.patch.object(
+                traversal_cache, "get_many", wraps=traversal_cache.get_many
+            ) as get_many,
+            mock.patch.object(
+                traversal_cache, "set_many", wraps=traversal_cache.set_many
+            ) as set_many,
+        ):
+            list(queryset)
+        # One lookup and one write for each of the two pages' batches
+        self.assertEqual(get_many.call_count, 2)
+        self.assertEqual(set_many.call_count, 2)
+        self.assertIsNone(set_many.call_args.kwargs["timeout"])
+
+    @override_settings(WAGTAIL_CONTENT_AUDIT_CACHE=None)
+    def test_memoize_traversal_without_cache(self):
+        traverse = mock.Mock(return_value=iter(["a", "b"]))
+        for _ in range(2):
+            memoize_traversal(
+                "test", self.streamfield, 3, self.stream_value, traverse
+            )
+        self.assertEqual(traverse.call_count, 2)
+
+    def test_content_hash_changes_with_content(self):
+        content_hash = get_content_hash(self.stream_value)
+        self.stream_value.raw_data[0]["value"] = "Changed"
+        self.assertNotEqual(get_content_hash(self.stream_value), content_hash)
+
+    def test_streamfield_fingerprint(self):
+        self.assertEqual(
+            get_streamfield_fingerprint(
+                SearchTestPage, "streamfield_with_block"
+            ),
+            get_streamfield_fingerprint(
+                SearchTestPage, "streamfield_with_block"
+            ),
+        )
+        self.assertNotEqual(
+            get_streamfield_fingerprint(
+                SearchTestPage, "streamfield_with_block"
+            ),
+            get_streamfield_fingerprint(
+                SearchTestPage, "streamfield_with_list"
+            ),
+        )
+
+    def test_block_usage_is_memoized(self):
+        queryset = BlockUsageQuerySet().filter(engine="raw")
+        expected = [
+            (b.field, b.path, b.total_occurrences, b.pages_count)
+            for b in queryset
+        ]
+
+        with mock.patch(
+            "wagtail_content_audit.query.blockusage.traverse_raw_streamvalue"
+        ) as traverse_raw_streamvalue:
+            results = [
+                (b.field, b.path, b.total_occurrences, b.pages_count)
+                for b in BlockUsageQuerySet().filter(engine="raw")
+            ]
+        traverse_raw_streamvalue.assert_not_called()
+        self.assertEqual(results, expected)
+
+    def test_page_search_is_not_memoized(self):
+        # Leaf text depends on linked pages and objects, not just the
+        # StreamField's JSON, so it isn't kept between searches
+        traversal_cache = caches["content_audit"]
+        with (
+            mock.patch.object(traversal_cache, "get_many") as get_many,
+            mock.patch.object(traversal_cache, "set_many") as set_many,
+            mock.patch.object(traversal_cache, "get") as get,
+            mock.patch.object(traversal_cache, "set") as set_,
+        ):
+            list(PageSearchQuerySet().filter(search="Test"))
+        get_many.assert_not_called()
+        set_many.assert_not_called()
+        get.assert_not_called()
+        set_.assert_not_called()
@@ -0,0 +1,123 @@
+from django.test import TestCase
+
+from wagtail.models import Page
+
+from wagtail_content_audit.index import (
+    get_page_block_usage,
+    index_page,
+    index_page_model,
+)
+from wagtail_content_audit.models import IndexedBlockUsage
+from wagtail_content_audit.signal_handlers import (
+    register_signal_handlers,
+    unregister_signal_handlers,
+)
+from wagtail_content_audit.tests.testapp.models import SearchTestPage
+
+
+class IndexTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
+    def setUp(self):
+        self.page_one = SearchTestPage.objects.get(id=3)
+        self.page_two = SearchTestPage.objects.get(id=4)
+
+    def test_get_page_block_usage(self):
+        block_usage = list(
+            get_page_block_usage(
+                SearchTestPage,
+                self.page_one.pk,
+                {"streamfield_with_list": self.page_one.streamfield_with_list},
+            )
+        )
+        self.assertEqual(
+            [
+                (usage.page_id, usage.field, usage.path, usage.occurrences)
+                for usage in block_usage
+            ],
+            [
+                (3, "streamfield_with_list", "list", 1),
+                (3, "streamfield_with_list", "list.item", 2),
+            ],
+        )
+
+    def test_index_page(self):
+        index_page(self.page_one)
+        self.assertEqual(
+            IndexedBlockUsage.objects.filter(page_id=3).count(), 9
+        )
+        self.assertEqual(
+            IndexedBlockUsage.objects.get(
+                page_id=3, field="streamfield_with_table", path="table.text"
+            ).occurrences,
+            2,
+        )
+
+    def test_index_page_replaces_existing_usage(self):
+        index_page(self.page_one)
+        self.page_one.streamfield_with_block = []
+        index_page(self.page_one)
+        self.assertFalse(
+            IndexedBlockUsage.objects.filter(
+                page_id=3, field="streamfield_with_block"
+            ).exists()
+        )
+        self.assertEqual(
+            IndexedBlockUsage.objects.filter(page_id=3).count(), 8
+        )
+
+    def test_index_page_model(self):
+        pages_count = index_page_model(SearchTestPage, batch_size=1)
+        self.assertEqual(pages_count, 2)
+        self.assertEqual(IndexedBlockUsage.objects.count(), 18)
+
+    def test_page_saved_without_signal_handlers(self):
+        self.page_one.save()
+        self.assertFalse(IndexedBlockUsage.objects.exists())
+
+    def test_page_deleted_removes_index(self):
+        index_page(self.page_one)
+        self.page_one.delete()
+        self.assertFalse(IndexedBlockUsage.objects.exists())
+
+
+class IndexSignalHandlersTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
+    def setUp(self):
+        register_signal_handlers()
+        self.addCleanup(unregister_signal_handlers)
+        self.page_one = SearchTestPage.objects.get(id=3)
+
+    def test_page_published_updates_index(self):
+        self.page_one.save_revision().publish()
+        self.assertEqual(
+            IndexedBlockUsage.objects.filter(page_id=3).count(), 9
+        )
+
+    def test_page_unpublished_updates_index(self):
+        self.page_one.unpublish()
+        self.assertEqual(
+            IndexedBlockUsage.objects.filter(page_id=3).count(), 9
+        )
+
+    def test_unpublished_page_is_indexed(self):
+        page = SearchTestPage(
+            title="Draft page",
+            slug="draft-page",
+            live=False,
+            streamfield_with_block=[("block", "Draft")],
+        )
+        Page.objects.get(id=2).add_child(instance=page)
+        self.assertEqual(
+            list(
+                IndexedBlockUsage.objects.filter(page_id=page.pk).values_list(
+                    "field", "path"
+                )
+            ),
+            [("streamfield_with_block", "block")],
+        )
+
+    def test_saving_revision_leaves_index(self):
+        self.page_one.save_revision()
+        self.assertFalse(IndexedBlockUsage.objects.exists())
@@ -1,8 +1,19 @@
+import json
+from datetime import date
 from io import StringIO
+from unittest import mock
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
+from wagtail.models import Page, Site
+
+from wagtail_content_audit.query import BlockUsageQuerySet
+from wagtail_content_audit.tests.test_query_blockusage import (
+    InProcessExecutor,
+)
+
 
 class BlockUsageCommandTestCase(TestCase):
     fixtures = ["wagtail_content_audit_testapp_fixture.json"]
@@ -29,3 +40,145 @@ class BlockUsageCommandTestCase(TestCase):
         self.assertNotIn(
             "streamfield_with_table,table.text", output.getvalue()
         )
+
+    def test_usage_raw_engine(self):
+        output = StringIO()
+        call_command("block_usage", "--engine", "raw", stdout=output)
+        self.assertIn("streamfield_with_block,block", output.getvalue())
+        self.assertIn("streamfield_with_list,list.item", output.getvalue())
+        self.assertIn("streamfield_with_table,table.text", output.getvalue())
+
+    def test_usage_index_engine(self):
+        call_command("build_block_usage_index", stdout=StringIO())
+        output = StringIO()
+        call_command("block_usage", "--engine", "index", stdout=output)
+        self.assertIn(
+            "streamfield_with_list,list.item,wagtail.blocks.field_block."
+            "CharBlock,4,2,2,2",
+            output.getvalue(),
+        )
+
+    def test_usage_sites(self):
+        Site.objects.create(
+            hostname="other.example", root_page=Page.objects.get(pk=4)
+        )
+        output = StringIO()
+        call_command("block_usage", "--sites", stdout=output)
+        self.assertIn(
+            "In localhost [default],In other.example", output.getvalue()
+        )
+        self.assertIn(
+            "streamfield_with_list,list.item,wagtail.blocks.field_block."
+            "CharBlock,4,2,2,2,1,1",
+            output.getvalue(),
+        )
+
+    def test_usage_revisions(self):
+        page = Page.objects.get(pk=3).specific
+        page.streamfield_with_table = []
+        page.save_revision()
+        output = StringIO()
+        call_command(
+            "block_usage", "--revisions", "--period", "year", stdout=output
+        )
+        year = date.today().replace(month=1, day=1).isoformat()
+        self.assertIn(
+            "streamfield_with_list,list.item,wagtail.blocks.field_block."
+            f"CharBlock,{year},1,",
+            output.getvalue(),
+        )
+        self.assertIn(
+            "streamfield_with_table,table.text,wagtail.blocks.field_block."
+            "CharBlock,,0,",
+            output.getvalue(),
+        )
+
+    def test_usage_jsonl(self):
+        output = StringIO()
+        call_command(
+            "block_usage",
+            "-p",
+            "testapp.SearchTestPage.streamfield_with_list",
+            "--format",
+            "jsonl",
+            stdout=output,
+        )
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertIn(
+            {
+                "page_type": (
+                    "wagtail_content_audit.tests.testapp.models.SearchTestPage"
+                ),
+                "field": "streamfield_with_list",
+                "path": "list.item",
+                "block": "wagtail.blocks.field_block.CharBlock",
+                "occurrences": 4,
+                "pages": 2,
+                "live": 2,
+                "in_default_site": 2,
+            },
+            rows,
+        )
+
+    def test_usage_checkpoint(self):
+        output = StringIO()
+        call_command("block_usage", "--checkpoint", "audit", stdout=output)
+        resumed_output = StringIO()
+        call_command(
+            "block_usage",
+            "--checkpoint",
+            "audit",
+            "--resume",
+            stdout=resumed_output,
+        )
+        self.assertIn("streamfield_with_list,list.item", output.getvalue())
+        self.assertEqual(resumed_output.getvalue(), output.getvalue())
+
+    def test_usage_checkpoint_invalid(self):
+        with self.assertRaises(CommandError):
+            call_command("block_usage", "--resume", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command(
+                "block_usage",
+                "--checkpoint",
+                "audit",
+                "--engine",
+                "index",
+                stdout=StringIO(),
+            )
+
+    def test_usage_results_are_not_kept(self):
+        # Results are streamed from the query rather than collected by
+        # iterating the queryset
+        with mock.patch.object(
+            BlockUsageQuerySet, "__iter__", side_effect=AssertionError
+        ):
+            for args in ((), ("--revisions",)):
+                output = StringIO()
+                call_command("block_usage", *args, stdout=output)
+                self.assertIn("streamfield_with_block", output.getvalue())
+
+    def test_usage_stats(self):
+        output = StringIO()
+        errors = StringIO()
+        call_command("block_usage", "--stats", stdout=output, stderr=errors)
+        self.assertIn("streamfield_with_list,list.item", output.getvalue())
+        self.assertIn("Database queries: ", errors.getvalue())
+        self.assertIn("Pages scanned: ", errors.getvalue())
+        self.assertIn(
+            "Page model wagtail_content_audit.tests.testapp.models."
+            "SearchTestPage: ",
+            errors.getvalue(),
+        )
+
+    def test_usage_jobs(self):
+        output = StringIO()
+        call_command("block_usage", stdout=output)
+        parallel_output = StringIO()
+        with mock.patch.object(
+            BlockUsageQuerySet,
+            "get_executor",
+            return_value=InProcessExecutor(),
+        ):
+            call_command("block_usage", "--jobs", "2", stdout=parallel_output)
+        self.assertEqual(parallel_output.getvalue(), output.getvalue())
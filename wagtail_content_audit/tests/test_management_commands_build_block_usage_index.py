@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from wagtail_content_audit.models import IndexedBlockUsage
+
+
+class BuildBlockUsageIndexCommandTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
+    def test_build_index(self):
+        output = StringIO()
+        call_command("build_block_usage_index", stdout=output)
+        self.assertIn(
+            "Indexed 2 testapp.SearchTestPage pages", output.getvalue()
+        )
+        self.assertEqual(IndexedBlockUsage.objects.count(), 18)
+
+    def test_build_index_with_page_type(self):
+        output = StringIO()
+        call_command(
+            "build_block_usage_index", "-p", "wagtailcore.Page", stdout=output
+        )
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(IndexedBlockUsage.objects.count(), 0)
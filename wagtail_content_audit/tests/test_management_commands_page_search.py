@@ -1,8 +1,19 @@
+import json
+import os
+import tempfile
 from io import StringIO
+from unittest import mock, skipUnless
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
+from wagtail.models import Page, Site
+
+from wagtail_content_audit.management.output import pyarrow
+from wagtail_content_audit.query import PageSearchQuerySet
+from wagtail_content_audit.tests.testapp.models import SearchTestPage
+
 
 class PageSearchCommandTestCase(TestCase):
     fixtures = ["wagtail_content_audit_testapp_fixture.json"]
@@ -13,6 +24,12 @@ class PageSearchCommandTestCase(TestCase):
         self.assertIn(",struct.givenname", output.getvalue())
         self.assertIn(",0.struct.givenname", output.getvalue())
 
+    def test_search_page_url(self):
+        page = SearchTestPage.objects.get(pk=3)
+        output = StringIO()
+        call_command("page_search", "-s", "Test", stdout=output)
+        self.assertIn(f",{page.title},{page.url},", output.getvalue())
+
     def test_search_regular_field(self):
         output = StringIO()
         call_command("page_search", "-s", "text", stdout=output)
@@ -36,3 +53,204 @@ class PageSearchCommandTestCase(TestCase):
         self.assertIn("0.block", output.getvalue())
         self.assertIn("0.list.item.0", output.getvalue())
         self.assertNotIn("0.struct.givenname", output.getvalue())
+
+    def test_search_all_sites(self):
+        other_root = Page.objects.get(id=1).add_child(
+            instance=SearchTestPage(title="Other Test home")
+        )
+        Site.objects.create(hostname="other.example", root_page=other_root)
+
+        output = StringIO()
+        call_command("page_search", "-s", "Other Test", stdout=output)
+        self.assertNotIn("other.example", output.getvalue())
+
+        output = StringIO()
+        call_command(
+            "page_search", "-s", "Other Test", "--all-sites", stdout=output
+        )
+        self.assertIn(",other.example,title,", output.getvalue())
+
+    def test_search_drafts(self):
+        page = SearchTestPage.objects.get(pk=3)
+        page.text = "Draft text"
+        page.save_revision()
+
+        output = StringIO()
+        call_command("page_search", "-s", "Draft", stdout=output)
+        self.assertNotIn("Draft", output.getvalue())
+
+        output = StringIO()
+        call_command("page_search", "-s", "Draft", "--drafts", stdout=output)
+        self.assertIn(
+            ",text,django.db.models.fields.TextField,", output.getvalue()
+        )
+
+    def test_search_text_mode(self):
+        output = StringIO()
+        call_command(
+            "page_search", "-s", "Test", "--text-mode", "plain", stdout=output
+        )
+        self.assertIn(",0.struct.givenname", output.getvalue())
+
+    def test_search_multiple_patterns(self):
+        output = StringIO()
+        call_command(
+            "page_search",
+            "-s",
+            "Test",
+            "-s",
+            "text",
+            "-p",
+            "testapp.SearchTestPage.text",
+            stdout=output,
+        )
+        self.assertIn(',"Test, text",', output.getvalue())
+
+    def test_search_jsonl(self):
+        output = StringIO()
+        call_command(
+            "page_search",
+            "-s",
+            "Test",
+            "-p",
+            "testapp.SearchTestPage.text",
+            "--format",
+            "jsonl",
+            stdout=output,
+        )
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["page_id"], 3)
+        self.assertEqual(rows[0]["field"], "text")
+        self.assertEqual(rows[0]["search_patterns"], ["Test"])
+        self.assertEqual(rows[0]["matches"], ["Test"])
+
+    def test_search_output_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "page_search.csv")
+            output = StringIO()
+            call_command(
+                "page_search",
+                "-s",
+                "Test",
+                "--output",
+                path,
+                "--batch-size",
+                "2",
+                stdout=output,
+            )
+            self.assertEqual(output.getvalue(), "")
+            with open(path) as output_file:
+                lines = output_file.read().splitlines()
+        self.assertTrue(lines[0].startswith("Page ID,Page Type,"))
+        self.assertEqual(len(lines), 12)
+
+    def test_search_arrow_requires_output(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "page_search",
+                "-s",
+                "Test",
+                "--format",
+                "arrow",
+                stdout=StringIO(),
+            )
+
+    @skipUnless(pyarrow is not None, "Requires pyarrow")
+    def test_search_arrow(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "page_search.arrow")
+            call_command(
+                "page_search",
+                "-s",
+                "Test",
+                "--format",
+                "arrow",
+                "--output",
+                path,
+                "--batch-size",
+                "5",
+                stdout=StringIO(),
+            )
+            with pyarrow.ipc.open_stream(path) as reader:
+                table = reader.read_all()
+        self.assertEqual(table.num_rows, 11)
+        self.assertEqual(table.schema.field("page_id").type, pyarrow.int64())
+        self.assertEqual(set(table.column("page_id").to_pylist()), {3})
+
+    def test_search_since(self):
+        output = StringIO()
+        call_command(
+            "page_search", "-s", "Test", "--since", "2000-01-01", stdout=output
+        )
+        self.assertEqual(len(output.getvalue().splitlines()), 1)
+
+        SearchTestPage.objects.filter(pk=3).update(
+            last_published_at="2001-01-01T00:00:00Z"
+        )
+        output = StringIO()
+        call_command(
+            "page_search", "-s", "Test", "--since", "2000-01-01", stdout=output
+        )
+        self.assertIn(",Test page,", output.getvalue())
+
+    def test_search_checkpoint(self):
+        for _ in range(2):
+            output = StringIO()
+            call_command(
+                "page_search",
+                "-s",
+                "Test",
+                "--checkpoint",
+                "daily",
+                stdout=output,
+            )
+            self.assertIn(",0.struct.givenname", output.getvalue())
+
+    def test_search_results_are_not_kept(self):
+        # Results are streamed from the query rather than collected by
+        # iterating the queryset
+        output = StringIO()
+        with mock.patch.object(
+            PageSearchQuerySet, "__iter__", side_effect=AssertionError
+        ):
+            call_command("page_search", "-s", "Test", stdout=output)
+        self.assertIn(",Test page,", output.getvalue())
+
+    def test_search_checkpoint_since(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "page_search",
+                "-s",
+                "Test",
+                "--since",
+                "2020-01-01",
+                "--checkpoint",
+                "daily",
+                stdout=StringIO(),
+            )
+
+    def test_search_stats(self):
+        errors = StringIO()
+        call_command(
+            "page_search",
+            "-s",
+            "Test",
+            "--stats",
+            stdout=StringIO(),
+            stderr=errors,
+        )
+        self.assertIn("Total time: ", errors.getvalue())
+        self.assertIn("Regular expression time: ", errors.getvalue())
+        self.assertIn(
+            "Field wagtail_content_audit.tests.testapp.models."
+            "SearchTestPage.streamfield_with_",
+            errors.getvalue(),
+        )
+
+    def test_search_without_stats(self):
+        errors = StringIO()
+        call_command(
+            "page_search", "-s", "Test", stdout=StringIO(), stderr=errors
+        )
+        self.assertEqual(errors.getvalue(), "")
@@ -1,13 +1,48 @@
+import base64
+import json
+import pickle
+from array import array
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from datetime import UTC, date, datetime
+from unittest import mock, skipUnless
+
+from django.db import connection
 from django.test import TestCase
 
+from wagtail.models import Revision, Site
+
+from wagtail_content_audit.index import index_page_model
+from wagtail_content_audit.models import BlockUsageCheckpoint
 from wagtail_content_audit.query.blockusage import (
+    ENGINES,
     BlockUsageQuerySet,
+    dump_page_blocks,
+    dump_page_ids,
+    get_page_ids_lengths,
+    get_streamfield_block_tree,
+    get_streamfield_path_ids,
+    load_page_blocks,
+    load_page_ids,
+    merge_page_blocks,
+    traverse_raw_streamvalue,
     traverse_streamblock,
     traverse_streamvalue,
 )
+from wagtail_content_audit.signals import audit_query_finished
 from wagtail_content_audit.tests.testapp.models import SearchTestPage
 
 
+class InProcessExecutor(Executor):
+    """Run calls as they are submitted in this process, pickling their
+    arguments and results as a process pool would"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        args, kwargs = pickle.loads(pickle.dumps((args, kwargs)))
+        future.set_result(pickle.loads(pickle.dumps(fn(*args, **kwargs))))
+        return future
+
+
 class BlockUsageTestCase(TestCase):
     fixtures = ["wagtail_content_audit_testapp_fixture.json"]
 
@@ -80,6 +115,118 @@ class BlockUsageTestCase(TestCase):
             ],
         )
 
+    def test_traverse_raw_streamvalue_matches_traverse_streamvalue(self):
+        for field_name in SearchTestPage.get_streamfield_names():
+            streamfield = SearchTestPage._meta.get_field(field_name)
+            value = getattr(self.page_one, field_name)
+            with self.subTest(field_name=field_name):
+                self.assertEqual(
+                    list(
+                        traverse_raw_streamvalue(
+                            streamfield.stream_block, value.raw_data
+                        )
+                    ),
+                    list(traverse_streamvalue(value)),
+                )
+
+    def test_traverse_raw_streamvalue_listvalue_block_format(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_list")
+        raw_data = [
+            {
+                "type": "list",
+                "value": [
+                    {"type": "item", "value": "One", "id": "1"},
+                    {"type": "item", "value": "Two", "id": "2"},
+                ],
+            }
+        ]
+        results = traverse_raw_streamvalue(streamfield.stream_block, raw_data)
+        self.assertEqual(list(results), ["list", "list.item", "list.item"])
+
+    def test_traverse_raw_streamvalue_skips_unknown_blocks(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_block")
+        raw_data = [
+            {"type": "block", "value": "Heading"},
+            {"type": "removed", "value": "Gone"},
+        ]
+        results = traverse_raw_streamvalue(streamfield.stream_block, raw_data)
+        self.assertEqual(list(results), ["block"])
+
+    def test_traverse_raw_streamvalue_struct_missing_child(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_struct")
+        raw_data = [{"type": "struct", "value": {"givenname": "Name"}}]
+        results = traverse_raw_streamvalue(streamfield.stream_block, raw_data)
+        self.assertEqual(
+            list(results), ["struct", "struct.givenname", "struct.surname"]
+        )
+
+    def test_get_streamfield_block_tree(self):
+        block_tree = get_streamfield_block_tree(
+            SearchTestPage, "streamfield_with_struct"
+        )
+        self.assertEqual(
+            [path for path, block in block_tree],
+            ["struct", "struct.givenname", "struct.surname"],
+        )
+        self.assertEqual(
+            block_tree[0][1], "wagtail.blocks.struct_block.StructBlock"
+        )
+        self.assertIs(
+            get_streamfield_block_tree(
+                SearchTestPage, "streamfield_with_struct"
+            ),
+            block_tree,
+        )
+
+    def test_get_streamfield_path_ids(self):
+        paths, transitions = get_streamfield_path_ids(
+            SearchTestPage, "streamfield_with_list"
+        )
+        self.assertEqual(paths, ("list", "list.item"))
+        self.assertEqual(transitions, {(None, "list"): 0, (0, "item"): 1})
+
+    def test_traverse_streamvalue_with_path_ids(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_struct")
+        paths, transitions = get_streamfield_path_ids(
+            SearchTestPage, "streamfield_with_struct"
+        )
+
+        def child_path(parent, block_name):
+            return transitions[parent, block_name]
+
+        value = self.page_one.streamfield_with_struct
+        path_ids = list(traverse_streamvalue(value, child_path=child_path))
+        raw_path_ids = list(
+            traverse_raw_streamvalue(
+                streamfield.stream_block,
+                value.raw_data,
+                child_path=child_path,
+            )
+        )
+        self.assertEqual(path_ids, raw_path_ids)
+        self.assertEqual(
+            [paths[path_id] for path_id in path_ids],
+            list(traverse_streamvalue(value)),
+        )
+
+    def test_blockusagequeryset_get_available_blocks_are_copies(self):
+        queryset = BlockUsageQuerySet().filter(field="streamfield_with_block")
+        first_blocks = queryset.get_available_blocks(SearchTestPage)
+        first_blocks["streamfield_with_block"]["block"].total_occurrences = 5
+
+        with mock.patch(
+            "wagtail_content_audit.query.blockusage.traverse_streamblock"
+        ) as traverse_streamblock:
+            second_blocks = queryset.get_available_blocks(SearchTestPage)
+        traverse_streamblock.assert_not_called()
+
+        audited_block = second_blocks["streamfield_with_block"]["block"]
+        self.assertEqual(audited_block.total_occurrences, 0)
+        self.assertIs(
+            audited_block.path,
+            first_blocks["streamfield_with_block"]["block"].path,
+        )
+
     def test_blockusagequeryset_get_filtered_page_models_no_filter(self):
         queryset = BlockUsageQuerySet()
         page_models = queryset.get_filtered_page_models()
@@ -141,6 +288,385 @@ class BlockUsageTestCase(TestCase):
         block = results["streamfield_with_block"]["block"]
         self.assertEqual(len(block.pages), 2)
         self.assertIn(self.page_one, block.pages)
+        self.assertEqual(sorted(block.page_ids), [3, 4])
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_repeated_block(
+        self,
+    ):
+        queryset = BlockUsageQuerySet()
+        results = queryset.audit_blocks_for_page_model(SearchTestPage)
+
+        block = results["streamfield_with_list"]["list.item"]
+        self.assertEqual(block.total_occurrences, 4)
+        self.assertEqual(block.pages_count, 2)
+        self.assertEqual(sorted(block.page_ids), [3, 4])
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_raw_engine(self):
+        streamvalue_results = BlockUsageQuerySet().audit_blocks_for_page_model(
+            SearchTestPage
+        )
+        raw_results = (
+            BlockUsageQuerySet()
+            .filter(engine="raw")
+            .audit_blocks_for_page_model(SearchTestPage)
+        )
+        self.assertEqual(raw_results, streamvalue_results)
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_database_engine(
+        self,
+    ):
+        streamvalue_results = BlockUsageQuerySet().audit_blocks_for_page_model(
+            SearchTestPage
+        )
+        database_results = (
+            BlockUsageQuerySet()
+            .filter(engine="database")
+            .audit_blocks_for_page_model(SearchTestPage)
+        )
+        for field_name, blocks in streamvalue_results.items():
+            for path, audited_block in blocks.items():
+                database_block = database_results[field_name][path]
+                with self.subTest(field_name=field_name, path=path):
+                    self.assertEqual(
+                        database_block.total_occurrences,
+                        audited_block.total_occurrences,
+                    )
+                    self.assertEqual(
+                        database_block.pages_count, audited_block.pages_count
+                    )
+                    self.assertEqual(
+                        database_block.pages_live_count,
+                        audited_block.pages_live_count,
+                    )
+                    self.assertEqual(
+                        database_block.pages_in_default_site_count,
+                        audited_block.pages_in_default_site_count,
+                    )
+                    self.assertEqual(
+                        database_block.page_ids, audited_block.page_ids
+                    )
+                    self.assertEqual(
+                        database_block.pages_per_site_count,
+                        audited_block.pages_per_site_count,
+                    )
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_chunk_size(self):
+        results = BlockUsageQuerySet().audit_blocks_for_page_model(
+            SearchTestPage
+        )
+        with self.assertNumQueries(2):
+            chunked_results = (
+                BlockUsageQuerySet()
+                .filter(chunk_size=1)
+                .audit_blocks_for_page_model(SearchTestPage)
+            )
+        self.assertEqual(chunked_results, results)
+
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_blockusagequeryset_database_engine_matches_raw(self):
+        Site.objects.create(
+            hostname="other.example.com", root_page_id=4, is_default_site=False
+        )
+
+        def get_results(engine):
+            results = list(BlockUsageQuerySet().filter(engine=engine))
+            # Page IDs are aggregated in no particular order in the database
+            for audited_block in results:
+                audited_block.page_ids = array(
+                    "q", sorted(audited_block.page_ids)
+                )
+            return results
+
+        self.assertEqual(get_results("database"), get_results("raw"))
+
+    def test_blockusagequeryset_get_page_id_ranges(self):
+        queryset = BlockUsageQuerySet()
+        self.assertEqual(
+            queryset.get_page_id_ranges(SearchTestPage, 1), [(3, 4)]
+        )
+        self.assertEqual(
+            queryset.get_page_id_ranges(SearchTestPage, 2), [(3, 3), (4, 4)]
+        )
+        self.assertEqual(
+            queryset.get_page_id_ranges(SearchTestPage, 3), [(3, 3), (4, 4)]
+        )
+
+        SearchTestPage.objects.all().delete()
+        self.assertEqual(queryset.get_page_id_ranges(SearchTestPage, 2), [])
+
+    def test_blockusagequeryset_get_executor(self):
+        executor = BlockUsageQuerySet().get_executor(2)
+        self.addCleanup(executor.shutdown)
+        self.assertIsInstance(executor, ProcessPoolExecutor)
+        self.assertEqual(executor._max_workers, 2)
+
+    def test_blockusagequeryset_workers(self):
+        results = list(BlockUsageQuerySet())
+        with mock.patch.object(
+            BlockUsageQuerySet,
+            "get_executor",
+            return_value=InProcessExecutor(),
+        ) as get_executor:
+            parallel_results = list(BlockUsageQuerySet().filter(workers=2))
+        get_executor.assert_called_once_with(2)
+        self.assertEqual(parallel_results, results)
+
+    def test_blockusagequeryset_workers_stats(self):
+        queryset = BlockUsageQuerySet().filter(stats=True)
+        list(queryset)
+        parallel_queryset = BlockUsageQuerySet().filter(workers=2, stats=True)
+        with mock.patch.object(
+            BlockUsageQuerySet,
+            "get_executor",
+            return_value=InProcessExecutor(),
+        ):
+            list(parallel_queryset)
+
+        # The workers' stats are added to the query's
+        stats, parallel_stats = queryset.stats, parallel_queryset.stats
+        self.assertEqual(parallel_stats.pages_scanned, stats.pages_scanned)
+        self.assertEqual(parallel_stats.blocks_visited, stats.blocks_visited)
+        self.assertEqual(
+            set(parallel_stats.field_times), set(stats.field_times)
+        )
+
+    def test_blockusagequeryset_workers_stops_early(self):
+        executor = mock.Mock(wraps=InProcessExecutor())
+        with mock.patch.object(
+            BlockUsageQuerySet, "get_executor", return_value=executor
+        ):
+            self.assertEqual(
+                len(list(BlockUsageQuerySet().filter(workers=2)[:1])), 1
+            )
+        executor.shutdown.assert_called_once_with(cancel_futures=True)
+
+    def test_load_page_ids(self):
+        queryset = BlockUsageQuerySet()
+        results = queryset.audit_blocks_for_page_model(SearchTestPage)
+        page_blocks = queryset.get_available_blocks(SearchTestPage)
+        page_ids = dump_page_ids(results, get_page_ids_lengths(page_blocks))
+        counts = dump_page_blocks(results)
+
+        # Blocks removed from the StreamField since are skipped
+        page_ids["streamfield_with_block"]["removed"] = page_ids[
+            "streamfield_with_block"
+        ]["block"]
+        counts["streamfield_with_block"]["removed"] = counts[
+            "streamfield_with_block"
+        ]["block"]
+
+        load_page_ids(load_page_blocks(page_blocks, counts), page_ids)
+        self.assertEqual(page_blocks, results)
+        self.assertNotIn("removed", page_blocks["streamfield_with_block"])
+
+    def test_merge_page_blocks(self):
+        queryset = BlockUsageQuerySet()
+        results = queryset.audit_blocks_for_page_model(SearchTestPage)
+        merged_results = merge_page_blocks(
+            queryset.audit_blocks_for_page_model(
+                SearchTestPage, page_id_range=(3, 3)
+            ),
+            queryset.audit_blocks_for_page_model(
+                SearchTestPage, page_id_range=(4, 4)
+            ),
+        )
+        self.assertEqual(merged_results, results)
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_index_engine(self):
+        index_page_model(SearchTestPage)
+        results = BlockUsageQuerySet().audit_blocks_for_page_model(
+            SearchTestPage
+        )
+        index_results = (
+            BlockUsageQuerySet()
+            .filter(engine="index")
+            .audit_blocks_for_page_model(SearchTestPage)
+        )
+        self.assertEqual(index_results, results)
+
+    def test_blockusagequeryset_audit_blocks_for_page_model_per_site(self):
+        default_site = Site.objects.get(is_default_site=True)
+        other_site = Site.objects.create(
+            hostname="other.example", root_page=self.page_two
+        )
+        index_page_model(SearchTestPage)
+
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                results = (
+                    BlockUsageQuerySet()
+                    .filter(engine=engine)
+                    .audit_blocks_for_page_model(SearchTestPage)
+                )
+                audited_block = results["streamfield_with_block"]["block"]
+                self.assertEqual(
+                    audited_block.pages_per_site_count,
+                    {default_site.pk: 1, other_site.pk: 1},
+                )
+                self.assertEqual(audited_block.pages_in_default_site_count, 2)
+
+    def test_blockusagequeryset_audit_revisions_for_page_model(self):
+        first_revision = self.page_one.save_revision()
+        self.page_one.streamfield_with_list = []
+        second_revision = self.page_one.save_revision()
+        third_revision = self.page_two.save_revision()
+        for revision, created_at in [
+            (first_revision, datetime(2024, 1, 15, tzinfo=UTC)),
+            (second_revision, datetime(2024, 3, 2, tzinfo=UTC)),
+            (third_revision, datetime(2024, 3, 20, tzinfo=UTC)),
+        ]:
+            Revision.objects.filter(pk=revision.pk).update(
+                created_at=created_at
+            )
+
+        queryset = BlockUsageQuerySet().filter(
+            revisions=True, field="streamfield_with_list"
+        )
+        results = queryset.audit_revisions_for_page_model(SearchTestPage)
+        audited_block = results["streamfield_with_list"]["list.item"]
+        self.assertEqual(audited_block.total_occurrences, 4)
+        self.assertEqual(audited_block.pages_count, 2)
+        self.assertEqual(list(audited_block.page_ids), [3, 4])
+        self.assertEqual(audited_block.revisions_count, 2)
+        self.assertEqual(
+            audited_block.revisions_by_period,
+            {date(2024, 1, 1): 1, date(2024, 3, 1): 1},
+        )
+        self.assertEqual(
+            audited_block.last_used_at, datetime(2024, 3, 20, tzinfo=UTC)
+        )
+
+        queryset = queryset.filter(period="year")
+        results = queryset.audit_revisions_for_page_model(SearchTestPage)
+        audited_block = results["streamfield_with_list"]["list.item"]
+        self.assertEqual(
+            audited_block.revisions_by_period, {date(2024, 1, 1): 2}
+        )
+
+    def test_blockusagequeryset_revisions_last_used_at(self):
+        # The later page's revision is the earlier one, so it is scanned
+        # after the latest revision that uses the block
+        first_revision = self.page_one.save_revision()
+        second_revision = self.page_two.save_revision()
+        for revision, created_at in [
+            (first_revision, datetime(2024, 6, 1, tzinfo=UTC)),
+            (second_revision, datetime(2024, 1, 1, tzinfo=UTC)),
+        ]:
+            Revision.objects.filter(pk=revision.pk).update(
+                created_at=created_at
+            )
+
+        queryset = BlockUsageQuerySet().filter(
+            revisions=True, field="streamfield_with_list"
+        )
+        results = queryset.audit_revisions_for_page_model(SearchTestPage)
+        audited_block = results["streamfield_with_list"]["list.item"]
+        self.assertEqual(
+            audited_block.last_used_at, datetime(2024, 6, 1, tzinfo=UTC)
+        )
+
+    def test_blockusagequeryset_checkpoint(self):
+        results = list(BlockUsageQuerySet())
+        queryset = BlockUsageQuerySet().filter(
+            checkpoint="audit", chunk_size=1
+        )
+        self.assertEqual(list(queryset), results)
+
+        checkpoint = BlockUsageCheckpoint.objects.get(name="audit")
+        self.assertIn(
+            "wagtail_content_audit.tests.testapp.models.SearchTestPage",
+            checkpoint.completed_page_models,
+        )
+        self.assertEqual(checkpoint.last_page_id, 4)
+
+        # Each batch only saves the page IDs it found blocks on
+        batches = checkpoint.batches.filter(
+            page_model=(
+                "wagtail_content_audit.tests.testapp.models.SearchTestPage"
+            )
+        ).order_by("pk")
+        self.assertEqual([batch.last_page_id for batch in batches], [3, 4])
+        self.assertEqual(
+            str(batches[0]),
+            f"{checkpoint.pk} wagtail_content_audit.tests.testapp.models."
+            "SearchTestPage 3",
+        )
+        for batch in batches:
+            page_ids = array("q")
+            page_ids.frombytes(
+                base64.b64decode(
+                    batch.page_ids["streamfield_with_block"]["block"]
+                )
+            )
+            self.assertEqual(list(page_ids), [batch.last_page_id])
+
+    def test_blockusagequeryset_checkpoint_resume(self):
+        results = list(BlockUsageQuerySet().filter(page_model=SearchTestPage))
+        queryset = BlockUsageQuerySet().filter(
+            page_model=SearchTestPage, checkpoint="audit", chunk_size=1
+        )
+        count_page_rows = BlockUsageQuerySet.count_page_rows
+
+        # Interrupt the audit after its first batch of pages
+        def count_first_batch(self, page_rows, *args, **kwargs):
+            if page_rows[0][0] != 3:
+                raise RuntimeError("Interrupted")
+            return count_page_rows(self, page_rows, *args, **kwargs)
+
+        with (
+            mock.patch.object(
+                BlockUsageQuerySet,
+                "count_page_rows",
+                autospec=True,
+                side_effect=count_first_batch,
+            ),
+            self.assertRaises(RuntimeError),
+        ):
+            list(queryset)
+        checkpoint = BlockUsageCheckpoint.objects.get(name="audit")
+        self.assertEqual(checkpoint.last_page_id, 3)
+
+        # Only the pages after the checkpoint are audited when resuming
+        with mock.patch.object(
+            BlockUsageQuerySet,
+            "count_page_rows",
+            autospec=True,
+            side_effect=count_page_rows,
+        ) as counted_page_rows:
+            self.assertEqual(list(queryset.filter(resume=True)), results)
+        self.assertEqual(
+            [call.args[1][0][0] for call in counted_page_rows.call_args_list],
+            [4],
+        )
+
+        # A finished audit is returned from the checkpoint and its batches
+        with self.assertNumQueries(2):
+            self.assertEqual(list(queryset.filter(resume=True)), results)
+
+    def test_blockusagequeryset_checkpoint_resume_different_audit(self):
+        list(BlockUsageQuerySet().filter(checkpoint="audit"))
+        queryset = BlockUsageQuerySet().filter(
+            checkpoint="audit", resume=True, engine="raw"
+        )
+        with self.assertRaises(ValueError):
+            list(queryset)
+
+    def test_blockusagequeryset_checkpoint_unsupported_engine(self):
+        queryset = BlockUsageQuerySet().filter(
+            checkpoint="audit", engine="index"
+        )
+        with self.assertRaises(ValueError):
+            list(queryset)
+
+    def test_blockusagequeryset_unknown_period(self):
+        queryset = BlockUsageQuerySet().filter(revisions=True, period="hour")
+        with self.assertRaises(ValueError):
+            list(queryset)
+
+    def test_blockusagequeryset_unknown_engine(self):
+        queryset = BlockUsageQuerySet().filter(engine="nonexistent")
+        with self.assertRaises(ValueError):
+            list(queryset)
 
     def test_blockusagequeryset_run_query(self):
         queryset = BlockUsageQuerySet()
@@ -149,3 +675,103 @@ class BlockUsageTestCase(TestCase):
 
         results = queryset[1:2]
         self.assertEqual(len(results), 1)
+
+    def test_blockusagequeryset_run_query_stops_when_sliced(self):
+        queryset = BlockUsageQuerySet()
+        # The default site, its root page, and the first page model's pages;
+        # the second page model is never audited
+        with (
+            mock.patch.object(
+                BlockUsageQuerySet,
+                "get_filtered_page_models",
+                return_value=[SearchTestPage, SearchTestPage],
+            ),
+            self.assertNumQueries(2),
+        ):
+            results = list(queryset[:9])
+        self.assertEqual(len(results), 9)
+
+    def test_blockusagequeryset_run_count(self):
+        queryset = BlockUsageQuerySet()
+        with self.assertNumQueries(0):
+            self.assertEqual(queryset.count(), 9)
+            self.assertEqual(queryset[1:3].count(), 2)
+            self.assertEqual(queryset[5:20].count(), 4)
+
+    def test_blockusagequeryset_stats(self):
+        received = []
+
+        def receiver(sender, queryset, stats, **kwargs):
+            received.append((sender, queryset, stats))
+
+        audit_query_finished.connect(receiver)
+        self.addCleanup(audit_query_finished.disconnect, receiver)
+
+        queryset = BlockUsageQuerySet().filter(
+            page_model=SearchTestPage, stats=True
+        )
+        results = list(queryset)
+
+        stats = queryset.stats
+        self.assertEqual(received, [(BlockUsageQuerySet, queryset, stats)])
+        self.assertEqual(stats.pages_scanned, SearchTestPage.objects.count())
+        self.assertEqual(
+            stats.blocks_visited,
+            sum(result.total_occurrences for result in results),
+        )
+        # Page StreamFields are decoded by the database backend
+        self.assertEqual(stats.json_bytes, 0)
+        self.assertGreater(stats.query_count, 0)
+        self.assertEqual(
+            list(stats.page_model_times),
+            ["wagtail_content_audit.tests.testapp.models.SearchTestPage"],
+        )
+        self.assertIn(
+            "wagtail_content_audit.tests.testapp.models.SearchTestPage"
+            ".streamfield_with_block",
+            stats.field_times,
+        )
+
+    def test_blockusagequeryset_stats_sliced(self):
+        received = []
+
+        def receiver(sender, stats, **kwargs):
+            received.append(stats)
+
+        audit_query_finished.connect(receiver)
+        self.addCleanup(audit_query_finished.disconnect, receiver)
+
+        # The signal is sent when a sliced query stops early
+        queryset = BlockUsageQuerySet().filter(stats=True)[:1]
+        self.assertEqual(len(list(queryset)), 1)
+        self.assertEqual(received, [queryset.stats])
+
+    def test_blockusagequeryset_stats_revisions(self):
+        self.page_one.save_revision()
+        queryset = BlockUsageQuerySet().filter(
+            page_model=SearchTestPage, revisions=True, stats=True
+        )
+        list(queryset)
+        self.assertEqual(queryset.stats.pages_scanned, 1)
+
+    def test_blockusagequeryset_stats_revisions_json_bytes(self):
+        # Revisions hold StreamFields as JSON strings, which some databases
+        # return decoded, so encode one again to be decoded on every database
+        revision = self.page_one.save_revision()
+        streamfield_json = revision.content["streamfield_with_list"]
+        revision.content["streamfield_with_list"] = json.dumps(
+            streamfield_json
+        )
+        revision.save()
+
+        queryset = BlockUsageQuerySet().filter(
+            page_model=SearchTestPage,
+            field="streamfield_with_list",
+            revisions=True,
+            stats=True,
+        )
+        results = {result.path: result for result in queryset}
+        self.assertEqual(results["list.item"].revisions_count, 1)
+        self.assertGreaterEqual(
+            queryset.stats.json_bytes, len(streamfield_json.encode())
+        )
@@ -1,11 +1,35 @@
+import json
 import re
+from dataclasses import FrozenInstanceError
+from datetime import UTC, datetime
+from unittest import mock
 
 from django.test import TestCase
 
+from wagtail.blocks import (
+    CharBlock,
+    ListBlock,
+    RichTextBlock,
+    StreamBlock,
+    StructBlock,
+)
+from wagtail.contrib.typed_table_block.blocks import TypedTableBlock
+from wagtail.models import Page, Site
+from wagtail.rich_text import RichText
+
+from wagtail_content_audit.models import PageSearchCheckpoint
 from wagtail_content_audit.query.pagesearch import (
+    LeafText,
+    PageMatch,
     PageSearchQuerySet,
+    SearchPlan,
+    extract_leaf_text,
+    extract_raw_leaf_text,
+    format_leaves,
+    get_required_substring,
     search_blocks,
 )
+from wagtail_content_audit.signals import audit_query_finished
 from wagtail_content_audit.tests.testapp.models import SearchTestPage
 
 
@@ -16,6 +40,85 @@ class PageSearchTestCase(TestCase):
         self.test_page = SearchTestPage.objects.get(id=3)
         self.notest_page = SearchTestPage.objects.get(id=4)
 
+    def test_get_required_substring(self):
+        self.assertEqual(get_required_substring(re.compile("Test")), "Test")
+        self.assertEqual(
+            get_required_substring(re.compile(r"[tT]est \d+ results")),
+            " results",
+        )
+        self.assertIsNone(get_required_substring(re.compile("a|b")))
+        self.assertIsNone(get_required_substring(re.compile("[tT]")))
+        self.assertIsNone(
+            get_required_substring(re.compile("Test", re.IGNORECASE))
+        )
+
+    def test_get_required_substring_without_parser(self):
+        with mock.patch.object(re, "_parser", None):
+            self.assertIsNone(get_required_substring(re.compile("Test")))
+
+    def test_search_plan_findall(self):
+        search_plan = SearchPlan.from_pattern(re.compile(r"Test \w+"))
+        self.assertEqual(search_plan.required_substring, "Test ")
+        self.assertEqual(search_plan.findall("A Test text"), ["Test text"])
+        self.assertEqual(search_plan.findall("No match"), [])
+
+    def test_search_plan_multiple_patterns(self):
+        search_plan = SearchPlan.from_patterns([r"Test \w+", "No", "x{3}"])
+        self.assertEqual(
+            search_plan.required_substrings, ("Test ", "No", None)
+        )
+        self.assertEqual(
+            search_plan.pattern.pattern, r"(?:Test \w+)|(?:No)|(?:x{3})"
+        )
+        self.assertEqual(
+            search_plan.search("A Test text, No match"),
+            (["Test text", "No"], [r"Test \w+", "No"]),
+        )
+        self.assertEqual(search_plan.search("Nothing"), (["No"], ["No"]))
+        self.assertEqual(search_plan.search("None here"), (["No"], ["No"]))
+        self.assertEqual(
+            search_plan.database_patterns, (r"Test \w+", "No", "x{3}")
+        )
+
+    def test_search_plan_multiple_patterns_match_separately(self):
+        # Backreferences and inline flags work as they do on their own
+        search_plan = SearchPlan.from_patterns([r"(a)\1", "b"])
+        self.assertIsNone(search_plan.pattern)
+        self.assertEqual(
+            search_plan.search("aa b"), (["a", "b"], [r"(a)\1", "b"])
+        )
+        search_plan = SearchPlan.from_patterns(["(?i)foo", "bar"])
+        self.assertIsNone(search_plan.pattern)
+        self.assertEqual(search_plan.search("FOO"), (["FOO"], ["(?i)foo"]))
+
+        # Overlapping patterns each match
+        search_plan = SearchPlan.from_patterns(["Old Program", "Program"])
+        self.assertEqual(
+            search_plan.search("the Old Program"),
+            (["Old Program", "Program"], ["Old Program", "Program"]),
+        )
+
+        # Patterns with groups match the same as a single pattern
+        search_plan = SearchPlan.from_patterns(["(T)est", "No"])
+        self.assertEqual(
+            search_plan.findall("Test"),
+            SearchPlan.from_patterns(["(T)est"]).findall("Test"),
+        )
+
+    def test_search_plan_multiple_patterns_required_substrings(self):
+        search_plan = SearchPlan.from_patterns(["Test", "(N)o"])
+        self.assertEqual(search_plan.required_substrings, ("Test", "o"))
+        self.assertEqual(search_plan.search("Test"), (["Test"], ["Test"]))
+        self.assertEqual(search_plan.search("N"), ([], []))
+
+    def test_search_blocks_with_search_plan(self):
+        search_plan = SearchPlan.from_pattern(re.compile("Test"))
+        result = list(
+            search_blocks(search_plan, self.test_page.streamfield_with_list)
+        )
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0][1], ["Test"])
+
     def test_search_blocks_boundblock(self):
         pattern = re.compile("Test")
 
@@ -120,10 +223,54 @@ class PageSearchTestCase(TestCase):
         )
         self.assertEqual(len(field_names), 0)
 
-    def test_pagesearchqueryset_get_search_re(self):
+    def test_pagesearchqueryset_get_search_plan(self):
         queryset = PageSearchQuerySet().filter(search="Test")
-        search_re = queryset.get_search_re()
-        self.assertEqual(search_re.pattern, "Test")
+        self.assertEqual(queryset.get_search_plan().pattern.pattern, "Test")
+
+    def test_pagesearchqueryset_get_search_patterns(self):
+        self.assertEqual(PageSearchQuerySet().get_search_patterns(), [""])
+        queryset = PageSearchQuerySet().filter(search=["Test", "text"])
+        self.assertEqual(queryset.get_search_patterns(), ["Test", "text"])
+        queryset = queryset.filter(search="content")
+        self.assertEqual(
+            queryset.get_search_patterns(), ["Test", "text", "content"]
+        )
+
+    def test_pagesearchqueryset_multiple_patterns(self):
+        queryset = PageSearchQuerySet().filter(
+            search=["Test", "content"], field="text"
+        )
+        self.assertEqual(
+            [
+                (match.page.id, match.matches, match.patterns)
+                for match in queryset
+            ],
+            [
+                (3, ("Test", "content"), ("Test", "content")),
+                (4, ("content",), ("content",)),
+            ],
+        )
+
+    def test_pagesearchqueryset_multiple_patterns_backreference(self):
+        queryset = PageSearchQuerySet().filter(
+            search=[r"(t)\1", "(?i)TEST"], field="text"
+        )
+        self.assertEqual(
+            [(match.page.id, match.patterns) for match in queryset],
+            [(3, ("(?i)TEST",))],
+        )
+
+    def test_pagesearchqueryset_multiple_patterns_streamfield(self):
+        single_results = [
+            (match.page.id, match.field_name, tuple(match.result_path))
+            for search in ("Test", "1")
+            for match in PageSearchQuerySet().filter(search=search)
+        ]
+        results = [
+            (match.page.id, match.field_name, tuple(match.result_path))
+            for match in PageSearchQuerySet().filter(search=["Test", "1"])
+        ]
+        self.assertEqual(sorted(results), sorted(set(single_results)))
 
     def test_pagesearchqueryset_prepare_pattern_for_json(self):
         queryset = PageSearchQuerySet()
@@ -156,6 +303,19 @@ class PageSearchTestCase(TestCase):
         self.assertEqual(len(match.result_path), 0)
         self.assertEqual(len(match.matches), 1)
 
+    def test_pagesearchqueryset_get_matches_for_page_model(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        matches = list(
+            queryset.get_matches_for_page_model(
+                SearchTestPage,
+                ["streamfield_with_block", "text", "latest_revision"],
+            )
+        )
+        self.assertEqual(
+            [(match.page.id, match.field_name) for match in matches],
+            [(3, "streamfield_with_block"), (3, "text")],
+        )
+
     def test_pagesearchqueryset_get_matches_for_page_model_field(self):
         queryset = PageSearchQuerySet().filter(search="Test")
         match = next(
@@ -194,3 +354,492 @@ class PageSearchTestCase(TestCase):
     def test_pagesearchqueryset_run_query(self):
         queryset = PageSearchQuerySet().filter(search="Test")
         self.assertEqual(queryset.count(), 11)
+
+    def test_pagesearchqueryset_run_query_results_are_distinct(self):
+        queryset = PageSearchQuerySet().filter(
+            search="Test",
+            page_model=SearchTestPage,
+            field="streamfield_with_list",
+        )
+        results = list(queryset)
+        self.assertEqual(
+            [match.result_path for match in results],
+            [("0", "list", "item", "0", ""), ("0", "list", "item", "1", "")],
+        )
+        self.assertIs(results[0].page, results[1].page)
+        self.assertEqual(results[0].page_id, 3)
+        with self.assertRaises(FrozenInstanceError):
+            results[0].matches = ()
+
+    def test_pagematch_page_lookup(self):
+        page_match = PageMatch(
+            page_model=SearchTestPage,
+            page_id=3,
+            field_name="text",
+            field_type="django.db.models.fields.TextField",
+            stream_field_path=(),
+            block_type=None,
+            result_path=(),
+            matches=("Test",),
+        )
+        self.assertEqual(page_match.page, self.test_page)
+
+    def test_pagesearchqueryset_run_query_pages_are_looked_up_lazily(self):
+        queryset = PageSearchQuerySet().filter(
+            search="Test",
+            page_model=SearchTestPage,
+            field="streamfield_with_list",
+        )
+        results = list(queryset)
+        self.assertEqual(
+            [match.page_title for match in results],
+            [self.test_page.title, self.test_page.title],
+        )
+        self.assertEqual(results[0].page_cache, {})
+        with self.assertNumQueries(1):
+            self.assertEqual(results[0].page, self.test_page)
+            self.assertIs(results[1].page, results[0].page)
+
+    def test_pagesearchqueryset_run_query_sliced(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        results = [
+            (match.page.id, match.field_name, match.result_path)
+            for match in queryset
+        ]
+        sliced_results = [
+            (match.page.id, match.field_name, match.result_path)
+            for match in queryset[2:5]
+        ]
+        self.assertEqual(sliced_results, results[2:5])
+
+    def test_pagesearchqueryset_run_count(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        self.assertEqual(queryset[2:5].count(), 3)
+        self.assertEqual(queryset[10:20].count(), 1)
+
+    def test_pagesearchqueryset_run_query_one_query_per_page_model(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        # The sites and their root pages, then one query per page model
+        with self.assertNumQueries(3):
+            list(queryset)
+
+    def test_pagesearchqueryset_sites(self):
+        default_site = Site.objects.get(is_default_site=True)
+        other_site = Site.objects.create(
+            hostname="other.example", root_page=self.notest_page
+        )
+
+        queryset = PageSearchQuerySet().filter(search="[Pp]age$")
+        self.assertEqual(
+            {(match.page.id, match.site) for match in queryset},
+            {(3, default_site), (4, other_site)},
+        )
+
+        queryset = PageSearchQuerySet().filter(
+            search="[Pp]age$", all_sites=True
+        )
+        self.assertEqual(
+            {(match.page.id, match.site) for match in queryset},
+            {(3, default_site), (4, other_site)},
+        )
+
+    def test_pagesearchqueryset_urls(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        self.assertEqual({match.url for match in queryset}, {None})
+
+        queryset = queryset.filter(urls=True)
+        self.assertEqual(
+            {(match.page_id, match.url) for match in queryset},
+            {(3, self.test_page.url)},
+        )
+
+    def test_pagesearchqueryset_since(self):
+        SearchTestPage.objects.filter(pk=3).update(
+            last_published_at=datetime(2020, 1, 1, tzinfo=UTC)
+        )
+        SearchTestPage.objects.filter(pk=4).update(
+            last_published_at=datetime(2024, 1, 1, tzinfo=UTC)
+        )
+        queryset = PageSearchQuerySet().filter(search="content", field="text")
+        self.assertEqual({match.page_id for match in queryset}, {3, 4})
+        self.assertEqual(
+            [
+                match.page_id
+                for match in queryset.filter(
+                    since=datetime(2022, 1, 1, tzinfo=UTC)
+                )
+            ],
+            [4],
+        )
+
+    def test_pagesearchqueryset_checkpoint(self):
+        def get_results(queryset):
+            return sorted(
+                (match.page_id, match.field_name, match.result_path)
+                for match in queryset.clone()
+            )
+
+        queryset = PageSearchQuerySet().filter(search="Test")
+        checkpoint_queryset = queryset.filter(checkpoint="daily")
+        results = get_results(queryset)
+        self.assertEqual(get_results(checkpoint_queryset), results)
+        checkpoint = PageSearchCheckpoint.objects.get(name="daily")
+        self.assertIsNotNone(checkpoint.watermark)
+
+        # Unchanged pages aren't searched again
+        with mock.patch.object(
+            PageSearchQuerySet, "get_matches_for_page_field"
+        ) as get_matches_for_page_field:
+            self.assertEqual(get_results(checkpoint_queryset), results)
+        get_matches_for_page_field.assert_not_called()
+
+        # The results of changed pages are replaced
+        self.test_page.text = "Changed text"
+        self.test_page.save_revision().publish()
+        self.assertNotIn((3, "text", ()), get_results(checkpoint_queryset))
+        self.assertEqual(
+            get_results(checkpoint_queryset), get_results(queryset)
+        )
+
+        # The results of unpublished pages are removed
+        self.test_page.unpublish()
+        self.assertEqual(get_results(checkpoint_queryset), [])
+
+    def test_pagesearchqueryset_checkpoint_run_twice(self):
+        queryset = PageSearchQuerySet().filter(
+            search="content", field="text", checkpoint="daily"
+        )
+        for _ in range(2):
+            self.assertEqual(
+                [match.page_id for match in queryset.clone()], [3, 4]
+            )
+        checkpoint = PageSearchCheckpoint.objects.get(name="daily")
+        self.assertEqual(checkpoint.results.count(), 2)
+
+    def test_pagesearchqueryset_checkpoint_since(self):
+        # The checkpoint's watermark decides which pages are searched
+        queryset = PageSearchQuerySet().filter(
+            search="content",
+            field="text",
+            since=datetime(2020, 1, 1, tzinfo=UTC),
+            checkpoint="daily",
+        )
+        with self.assertRaises(ValueError):
+            list(queryset)
+        self.assertFalse(PageSearchCheckpoint.objects.exists())
+
+    def test_pagesearchqueryset_checkpoint_count(self):
+        queryset = PageSearchQuerySet().filter(
+            search="content", field="text", checkpoint="daily"
+        )
+
+        # Counting doesn't run the search or update the checkpoint
+        self.assertEqual(queryset.count(), 0)
+        self.assertFalse(PageSearchCheckpoint.objects.exists())
+
+        list(queryset.clone())
+        watermark = PageSearchCheckpoint.objects.get(name="daily").watermark
+        self.assertEqual(queryset.clone().count(), 2)
+        self.assertEqual(queryset[1:].count(), 1)
+        self.assertEqual(queryset[:1].count(), 1)
+        self.assertEqual(
+            PageSearchCheckpoint.objects.get(name="daily").watermark,
+            watermark,
+        )
+
+    def test_pagesearchqueryset_checkpoint_search_changed(self):
+        list(PageSearchQuerySet().filter(search="Test", checkpoint="daily"))
+
+        # The kept results are replaced when the search changes
+        queryset = PageSearchQuerySet().filter(
+            search="content", field="text", checkpoint="daily"
+        )
+        self.assertEqual([match.page_id for match in queryset], [3, 4])
+        checkpoint = PageSearchCheckpoint.objects.get(name="daily")
+        self.assertEqual(checkpoint.search["search"], ["content"])
+        self.assertEqual(checkpoint.results.count(), 2)
+
+    def test_pagesearchqueryset_all_sites(self):
+        other_root = Page.objects.get(id=1).add_child(
+            instance=SearchTestPage(title="Other Test home")
+        )
+        other_site = Site.objects.create(
+            hostname="other.example", root_page=other_root
+        )
+
+        queryset = PageSearchQuerySet().filter(search="Other Test")
+        self.assertEqual(len(queryset), 0)
+
+        queryset = PageSearchQuerySet().filter(
+            search="Other Test", all_sites=True
+        )
+        self.assertEqual(
+            [(match.page.id, match.site) for match in queryset],
+            [(other_root.id, other_site)] * 2,
+        )
+
+    def test_extract_raw_leaf_text_matches_extract_leaf_text(self):
+        for field_name in SearchTestPage.get_streamfield_names():
+            streamfield = SearchTestPage._meta.get_field(field_name)
+            for page in (self.test_page, self.notest_page):
+                value = getattr(page, field_name)
+                with self.subTest(field_name=field_name, page=page.pk):
+                    self.assertEqual(
+                        list(
+                            format_leaves(
+                                extract_raw_leaf_text(
+                                    streamfield.stream_block, value.raw_data
+                                )
+                            )
+                        ),
+                        list(format_leaves(extract_leaf_text(value))),
+                    )
+
+        # Stored values the test pages don't have: a nested StreamBlock, a
+        # StructBlock child saved before it was added, a ListBlock in the
+        # Wagtail 2.16+ format, and an empty TypedTableBlock
+        stream_block = StreamBlock(
+            [
+                ("nested", StreamBlock([("text", CharBlock())])),
+                (
+                    "struct",
+                    StructBlock(
+                        [
+                            ("givenname", CharBlock()),
+                            ("surname", CharBlock(default="Surname")),
+                        ]
+                    ),
+                ),
+                ("list", ListBlock(CharBlock())),
+                ("table", TypedTableBlock([("text", CharBlock())])),
+            ]
+        )
+        raw_data = [
+            {
+                "type": "nested",
+                "value": [{"type": "text", "value": "Nested", "id": "1"}],
+                "id": "2",
+            },
+            {"type": "struct", "value": {"givenname": "Given"}, "id": "3"},
+            {
+                "type": "list",
+                "value": [{"type": "item", "value": "Item", "id": "4"}],
+                "id": "5",
+            },
+            {"type": "table", "value": None, "id": "6"},
+        ]
+        self.assertEqual(
+            list(format_leaves(extract_raw_leaf_text(stream_block, raw_data))),
+            list(
+                format_leaves(
+                    extract_leaf_text(stream_block.to_python(raw_data))
+                )
+            ),
+        )
+        self.assertEqual(
+            [
+                text
+                for _, _, text in format_leaves(
+                    extract_raw_leaf_text(stream_block, raw_data)
+                )
+            ],
+            ["Nested", "Given", "Surname", "Item"],
+        )
+
+    def test_pagesearchqueryset_drafts_matches_live(self):
+        self.test_page.save_revision()
+        self.notest_page.save_revision()
+        field_names = SearchTestPage.get_streamfield_names()
+
+        def get_results(queryset):
+            for field_name in field_names:
+                queryset = queryset.filter(field=field_name)
+            return [
+                (
+                    match.page.pk,
+                    match.field_name,
+                    match.result_path,
+                    match.stream_field_path,
+                    match.block_type,
+                    match.matches,
+                )
+                for match in queryset.filter(page_model=SearchTestPage)
+            ]
+
+        queryset = PageSearchQuerySet().filter(search="Test|1")
+        self.assertEqual(
+            get_results(queryset.filter(drafts=True)), get_results(queryset)
+        )
+
+    def test_pagesearchqueryset_drafts(self):
+        self.test_page.streamfield_with_struct = [
+            ("struct", {"givenname": "Draftname", "surname": "Surname"})
+        ]
+        self.test_page.save_revision()
+
+        queryset = PageSearchQuerySet().filter(search="Draft")
+        self.assertEqual(len(queryset), 0)
+
+        queryset = PageSearchQuerySet().filter(search="Draft", drafts=True)
+        results = [
+            (match.page.pk, match.field_name, match.result_path)
+            for match in queryset
+        ]
+        self.assertEqual(
+            results,
+            [(3, "streamfield_with_struct", ("0", "struct", "givenname"))],
+        )
+
+    def test_pagesearchqueryset_drafts_title(self):
+        self.test_page.title = "Draft title"
+        self.test_page.save_revision()
+
+        queryset = PageSearchQuerySet().filter(
+            search="Test", page_model=SearchTestPage, field="text"
+        )
+        self.assertEqual(
+            {match.page_title for match in queryset if match.page_id == 3},
+            {"Test page"},
+        )
+        for drafts_queryset in (
+            queryset.filter(drafts=True),
+            queryset.filter(drafts=True, checkpoint="drafts"),
+        ):
+            self.assertEqual(
+                {
+                    match.page_title
+                    for match in drafts_queryset
+                    if match.page_id == 3
+                },
+                {"Draft title"},
+            )
+
+    def test_pagesearchqueryset_drafts_json_string(self):
+        # Older revisions hold StreamFields as JSON strings
+        self.test_page.streamfield_with_struct = [
+            ("struct", {"givenname": "Draftname", "surname": "Surname"})
+        ]
+        revision = self.test_page.save_revision()
+        revision.content["streamfield_with_struct"] = json.dumps(
+            revision.content["streamfield_with_struct"]
+        )
+        revision.save()
+
+        queryset = PageSearchQuerySet().filter(search="Draft", drafts=True)
+        self.assertEqual(
+            [(match.page.pk, match.result_path) for match in queryset],
+            [(3, ("0", "struct", "givenname"))],
+        )
+
+    def test_leaf_text(self):
+        rich_text = RichText(
+            '<p>Test &amp; <a linktype="page" id="3">page</a></p>'
+        )
+        self.assertEqual(LeafText()(1.0), "1.0")
+        self.assertEqual(LeafText("source")(rich_text), rich_text.source)
+        self.assertEqual(LeafText("plain")(rich_text), "Test & page")
+        self.assertIn('<a href="', LeafText("rendered")(rich_text))
+        with self.assertRaises(ValueError):
+            LeafText("markdown")
+
+    def test_leaf_text_caches_rich_text(self):
+        leaf_text = LeafText("rendered")
+        with mock.patch.object(
+            RichText, "__str__", return_value="<p>Test</p>"
+        ) as rich_text_str:
+            for _ in range(2):
+                self.assertEqual(
+                    leaf_text(RichText("<p>Test</p>")), "<p>Test</p>"
+                )
+        rich_text_str.assert_called_once()
+
+    def test_extract_leaf_text_rich_text_modes(self):
+        stream_block = StreamBlock([("rich", RichTextBlock())])
+        raw_data = [
+            {
+                "type": "rich",
+                "value": '<p>Test <a linktype="page" id="3">page</a></p>',
+            }
+        ]
+        value = stream_block.to_python(raw_data)
+        for text_mode, text in [
+            ("source", raw_data[0]["value"]),
+            ("plain", "Test page"),
+        ]:
+            with self.subTest(text_mode=text_mode):
+                leaves = list(
+                    extract_leaf_text(value, leaf_text=LeafText(text_mode))
+                )
+                self.assertEqual(leaves[0][1], text)
+                self.assertEqual(
+                    list(
+                        extract_raw_leaf_text(
+                            stream_block,
+                            raw_data,
+                            leaf_text=LeafText(text_mode),
+                        )
+                    ),
+                    leaves,
+                )
+
+    def test_pagesearchqueryset_text_mode(self):
+        queryset = PageSearchQuerySet().filter(
+            search="Test", text_mode="plain"
+        )
+        self.assertEqual(
+            queryset.get_search_plan().leaf_text.text_mode, "plain"
+        )
+        self.assertGreater(len(queryset), 0)
+
+    def test_pagesearchqueryset_stats(self):
+        received = []
+
+        def receiver(sender, queryset, stats, **kwargs):
+            received.append((sender, queryset, stats))
+
+        audit_query_finished.connect(receiver)
+        self.addCleanup(audit_query_finished.disconnect, receiver)
+
+        queryset = PageSearchQuerySet().filter(
+            search="Test", page_model=SearchTestPage, stats=True
+        )
+        results = list(queryset)
+        self.assertGreater(len(results), 0)
+
+        stats = queryset.stats
+        self.assertEqual(received, [(PageSearchQuerySet, queryset, stats)])
+        # Only the page whose fields contain a match in the database
+        self.assertEqual(stats.pages_scanned, 1)
+        self.assertGreater(stats.query_count, 0)
+        self.assertGreater(stats.blocks_visited, 0)
+        # Page StreamFields are decoded by the database backend
+        self.assertEqual(stats.json_bytes, 0)
+        self.assertGreater(stats.total_time, 0)
+        self.assertEqual(
+            list(stats.page_model_times),
+            ["wagtail_content_audit.tests.testapp.models.SearchTestPage"],
+        )
+        self.assertIn(
+            "wagtail_content_audit.tests.testapp.models.SearchTestPage"
+            ".streamfield_with_list",
+            stats.field_times,
+        )
+
+    def test_pagesearchqueryset_stats_drafts(self):
+        # Older revisions hold StreamFields as JSON strings
+        revision = self.test_page.save_revision()
+        revision.content["streamfield_with_list"] = json.dumps(
+            revision.content["streamfield_with_list"]
+        )
+        revision.save()
+
+        queryset = PageSearchQuerySet().filter(
+            search="Test", drafts=True, stats=True
+        )
+        list(queryset)
+        self.assertGreater(queryset.stats.json_bytes, 0)
+
+    def test_pagesearchqueryset_without_stats(self):
+        queryset = PageSearchQuerySet().filter(search="Test")
+        list(queryset)
+        self.assertIsNone(queryset.stats)
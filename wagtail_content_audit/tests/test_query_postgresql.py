@@ -0,0 +1,64 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from wagtail.models import Site
+
+from wagtail_content_audit.query.postgresql import (
+    audit_blocks_in_database,
+    get_block_definitions,
+    get_block_kind,
+)
+from wagtail_content_audit.tests.testapp.models import SearchTestPage
+
+
+class PostgreSQLTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
+    def test_get_block_kind(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_table")
+        self.assertEqual(get_block_kind(streamfield.stream_block), "stream")
+        table_block = streamfield.stream_block.child_blocks["table"]
+        self.assertEqual(get_block_kind(table_block), "table")
+        self.assertEqual(
+            get_block_kind(table_block.child_blocks["text"]), "leaf"
+        )
+
+    def test_get_block_definitions(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_list")
+        self.assertEqual(
+            list(get_block_definitions(streamfield.stream_block)),
+            [
+                ("", "list", "list", "list"),
+                ("list", "item", "list.item", "leaf"),
+            ],
+        )
+
+    def test_get_block_definitions_struct(self):
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_struct")
+        self.assertEqual(
+            list(get_block_definitions(streamfield.stream_block)),
+            [
+                ("", "struct", "struct", "struct"),
+                ("struct", "givenname", "struct.givenname", "leaf"),
+                ("struct", "surname", "struct.surname", "leaf"),
+            ],
+        )
+
+    @skipUnless(connection.vendor == "postgresql", "Requires PostgreSQL")
+    def test_audit_blocks_in_database(self):
+        site = Site.objects.get(is_default_site=True)
+        streamfield = SearchTestPage._meta.get_field("streamfield_with_table")
+        results = audit_blocks_in_database(
+            SearchTestPage.objects.exact_type(SearchTestPage),
+            streamfield,
+            site.root_page.path,
+        )
+        self.assertEqual(results["table"], (2, 2, 2, 2, [3, 4], [None, None]))
+        self.assertEqual(
+            results["table.text"], (4, 2, 2, 2, [3, 4], [None, None])
+        )
+        self.assertEqual(
+            results["table.numeric"], (4, 2, 2, 2, [3, 4], [None, None])
+        )
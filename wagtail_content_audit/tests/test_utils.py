@@ -1,12 +1,22 @@
+from unittest import mock
+
 from django.test import TestCase
 
-from wagtail.models import Page
+from wagtail.models import Page, Site
 
 from wagtail_content_audit.tests.testapp.models import SearchTestPage
-from wagtail_content_audit.utils import dotted_name, get_page_models_and_fields
+from wagtail_content_audit.utils import (
+    PageURLs,
+    SiteRootPaths,
+    dotted_name,
+    get_page_models_and_fields,
+    get_site_id_expression,
+)
 
 
 class UtilsTestCase(TestCase):
+    fixtures = ["wagtail_content_audit_testapp_fixture.json"]
+
     def test_dotted_name(self):
         name = dotted_name(SearchTestPage)
         self.assertEqual(
@@ -26,3 +36,88 @@ class UtilsTestCase(TestCase):
         self.assertIn(
             (SearchTestPage, "streamfield_with_block"), page_models_and_fields
         )
+
+    def test_get_site_id_expression(self):
+        default_site = Site.objects.get(is_default_site=True)
+        other_site = Site.objects.create(
+            hostname="other.example", root_page_id=4
+        )
+        site_ids = dict(
+            Page.objects.annotate(
+                site_id=get_site_id_expression(Site.objects.all())
+            ).values_list("pk", "site_id")
+        )
+        self.assertEqual(
+            site_ids,
+            {
+                1: None,
+                2: default_site.pk,
+                3: default_site.pk,
+                4: other_site.pk,
+            },
+        )
+
+    def test_site_root_paths(self):
+        sites = {
+            path: Site(
+                pk=pk,
+                hostname=f"{pk}.example",
+                root_page=Page(path=path, depth=len(path) // 4),
+                is_default_site=pk == 1,
+            )
+            for pk, path in [
+                (1, "00010001"),
+                (2, "000100010002"),
+                (3, "0001000100020001"),
+                (4, "000100010003"),
+                (5, "00010002"),
+            ]
+        }
+        duplicate_site = Site(
+            pk=6, hostname="6.example", root_page=sites["00010001"].root_page
+        )
+        site_root_paths = SiteRootPaths([*sites.values(), duplicate_site])
+
+        for page_path, site_path in [
+            ("0001", None),
+            ("00010001", "00010001"),
+            ("000100010001", "00010001"),
+            ("000100010002", "000100010002"),
+            ("00010001000200010005", "0001000100020001"),
+            ("0001000100020002", "000100010002"),
+            ("00010001000300050001", "000100010003"),
+            ("000100010004", "00010001"),
+            ("000100020001", "00010002"),
+            ("0002", None),
+        ]:
+            with self.subTest(page_path=page_path):
+                self.assertIs(
+                    site_root_paths.get_site(page_path), sites.get(site_path)
+                )
+
+    def test_page_urls(self):
+        pages = list(Page.objects.all())
+        page_urls = PageURLs()
+        self.assertEqual(
+            [page_urls.get_url(page) for page in pages],
+            [page.url for page in pages],
+        )
+
+        Site.objects.create(hostname="other.example", root_page_id=4)
+        page_urls = PageURLs()
+        self.assertEqual(
+            [page_urls.get_url(page) for page in pages],
+            [Page.objects.get(pk=page.pk).url for page in pages],
+        )
+        self.assertEqual(
+            page_urls.get_url(Page.objects.get(pk=4)),
+            "http://other.example/",
+        )
+
+    def test_page_urls_memoized(self):
+        page = Page.objects.get(pk=3)
+        page_urls = PageURLs()
+        url = page_urls.get_url(page)
+        with mock.patch.object(page, "get_url_parts") as get_url_parts:
+            self.assertEqual(page_urls.get_url(page), url)
+        get_url_parts.assert_not_called()
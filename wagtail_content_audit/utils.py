@@ -1,9 +1,23 @@
-from wagtail.models import get_page_models
+from bisect import bisect_right
+from types import SimpleNamespace
+
+from django.db.models import Case, IntegerField, Value, When
+
+from wagtail.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.contrib.typed_table_block.blocks import TypedTableBlock
+from wagtail.models import Site, get_page_models
 
 
 dotted_name = lambda cls: ".".join((cls.__module__, cls.__qualname__))
 
 
+def get_filter_value(filters, key, default=None):
+    """Return the first value given for a queryish filter key"""
+    return next(
+        (val for filter_key, val in filters if filter_key == key), default
+    )
+
+
 def get_page_models_and_fields(pagetypes=None):
     page_models = get_page_models()
 
@@ -16,3 +30,193 @@ def get_page_models_and_fields(pagetypes=None):
             )
             if pagetypes is None or pagetype_str in pagetypes:
                 yield page_model, field.name
+
+
+def get_site_id_expression(sites, prefix=""):
+    """Return an expression for the ID of the Site each page belongs to
+
+    Like Page.get_site(), a page belongs to the site with the deepest root
+    page that it is, or descends from. prefix is prepended to the path
+    lookup, to annotate querysets of models related to pages."""
+    sites = sorted(
+        sites,
+        key=lambda site: (
+            -site.root_page.depth,
+            not site.is_default_site,
+            site.pk,
+        ),
+    )
+    return Case(
+        *(
+            When(
+                **{f"{prefix}path__startswith": site.root_page.path},
+                then=Value(site.pk),
+            )
+            for site in sites
+        ),
+        default=None,
+        output_field=IntegerField(),
+    )
+
+
+class SiteRootPaths:
+    """Find the Site each page belongs to from its treebeard path
+
+    Like Page.get_site(), a page belongs to the site with the deepest root
+    page that it is, or descends from. Site root paths are kept sorted, so
+    finding a page's site is a bisect, followed by a walk out through any
+    site roots that enclose the nearest one."""
+
+    def __init__(self, sites):
+        # Where sites share a root page, prefer the default site
+        sites = sorted(
+            sites,
+            key=lambda site: (
+                site.root_page.path,
+                not site.is_default_site,
+                site.pk,
+            ),
+        )
+        sites_by_path = {}
+        for site in sites:
+            sites_by_path.setdefault(site.root_page.path, site)
+
+        self.paths = list(sites_by_path.keys())
+        self.sites = list(sites_by_path.values())
+
+        # The index of the nearest site root enclosing each site root
+        self.enclosing = []
+        enclosing_stack = []
+        for index, path in enumerate(self.paths):
+            while enclosing_stack and not path.startswith(
+                self.paths[enclosing_stack[-1]]
+            ):
+                enclosing_stack.pop()
+            self.enclosing.append(
+                enclosing_stack[-1] if enclosing_stack else None
+            )
+            enclosing_stack.append(index)
+
+    def get_site(self, page_path):
+        """Return the Site a page belongs to, or None"""
+        # The nearest site root at or before the page in tree order either
+        # contains the page, or is enclosed by the site root that does
+        index = bisect_right(self.paths, page_path) - 1
+        if index < 0:
+            return None
+        while index is not None and not page_path.startswith(
+            self.paths[index]
+        ):
+            index = self.enclosing[index]
+        return self.sites[index] if index is not None else None
+
+
+class PageURLs:
+    """Resolve the URLs of pages like Page.url, memoized by page ID
+
+    Page.url looks up the site root paths for every page. Here they are
+    looked up once, and handed to each page's get_url_parts() the way
+    Wagtail caches them on a request, so resolving a URL is only a match
+    of the page's url_path against the root paths and a reverse()."""
+
+    def __init__(self, site_root_paths=None):
+        if site_root_paths is None:
+            site_root_paths = Site.get_site_root_paths()
+        self.cache_object = SimpleNamespace(
+            _wagtail_cached_site_root_paths=site_root_paths
+        )
+        self.num_sites = len(
+            {site_root_path.site_id for site_root_path in site_root_paths}
+        )
+        self.urls = {}
+
+    def get_url(self, page):
+        """Return the URL of a page, or None if it isn't routable"""
+        if page.pk not in self.urls:
+            self.urls[page.pk] = self.resolve_url(page)
+        return self.urls[page.pk]
+
+    def resolve_url(self, page):
+        url_parts = page.get_url_parts(request=self.cache_object)
+        if url_parts is None or url_parts[1] is None and url_parts[2] is None:
+            return None
+
+        # Like Page.url, URLs are relative when there is only one site
+        site_id, root_url, page_path = url_parts
+        return page_path if self.num_sites == 1 else root_url + page_path
+
+
+def walk_raw_blocks(block, value, parent, child_path):
+    """Walk the raw JSON of a block's value against its block definitions,
+    without converting it into StreamValue objects, and yield the block,
+    raw value, and path of each of its descendants
+
+    child_path(parent, child_block, position) returns the path of a child
+    block from its parent's path and its position in the parent's value, a
+    tuple of the indexes that locate it there."""
+
+    # This is a sequence of blocks, each a {"type": ..., "value": ...} dict
+    if isinstance(block, StreamBlock):
+        for index, child in enumerate(value or []):
+            child_block = block.child_blocks.get(child["type"])
+
+            # StreamBlock.to_python() drops unrecognized block types
+            if child_block is not None:
+                child_value = child.get("value")
+                path = child_path(parent, child_block, (index,))
+                yield child_block, child_value, path
+                yield from walk_raw_blocks(
+                    child_block, child_value, path, child_path
+                )
+
+    # This is a dict of child block values keyed by child block name
+    elif isinstance(block, StructBlock):
+        for child_name, child_block in block.child_blocks.items():
+            if child_name in value:
+                child_value = value[child_name]
+            else:
+                # StructBlock.to_python() populates missing children with
+                # their defaults
+                child_value = child_block.get_prep_value(
+                    child_block.get_default()
+                )
+            path = child_path(parent, child_block, ())
+            yield child_block, child_value, path
+            yield from walk_raw_blocks(
+                child_block, child_value, path, child_path
+            )
+
+    # This is a list of {"type": "item", "value": ..., "id": ...} dicts, or
+    # of bare values for lists saved before Wagtail 2.16
+    elif isinstance(block, ListBlock):
+        child_block = block.child_block
+        for index, child in enumerate(value or []):
+            if (
+                isinstance(child, dict)
+                and "id" in child
+                and "value" in child
+                and child.get("type") == "item"
+            ):
+                child = child["value"]
+            path = child_path(parent, child_block, ("item", index))
+            yield child_block, child, path
+            yield from walk_raw_blocks(child_block, child, path, child_path)
+
+    # This is a dict of columns and rows of values. Like the paths page
+    # search gives table cells, a cell's position includes the index of
+    # every column up to its own.
+    elif isinstance(block, TypedTableBlock) and value:
+        column_blocks = [
+            block.child_blocks[column["type"]] for column in value["columns"]
+        ]
+        for row_index, row in enumerate(value["rows"]):
+            position = (row_index,)
+            for column_index, (child_block, child) in enumerate(
+                zip(column_blocks, row["values"], strict=False)
+            ):
+                position = position + (column_index,)
+                path = child_path(parent, child_block, position)
+                yield child_block, child, path
+                yield from walk_raw_blocks(
+                    child_block, child, path, child_path
+                )